@@ -0,0 +1,223 @@
+import atexit
+import threading
+from datetime import timezone
+
+from django.apps.registry import Apps
+from django.conf import settings
+from django.db import DatabaseError, connections, models
+from django.utils import timezone as tz
+
+# Label of the app this module was copied into (e.g. "accounts.audit" -> "accounts")
+APP_LABEL = __name__.rpartition('.')[0].rpartition('.')[2]
+TABLE_PREFIX = f'{APP_LABEL}_authevent_'
+
+LOGIN = 'login'
+LOGIN_FAILED = 'login_failed'
+LOGOUT = 'logout'
+EMAIL_VERIFIED = 'email_verified'
+PASSWORD_RESET_REQUESTED = 'password_reset_requested'
+PASSWORD_RESET = 'password_reset'
+
+# Monthly models live in their own registry: they are never migrated, the
+# tables are created on first write and dropped whole by pruneauditlog.
+_apps = Apps()
+_models = {}
+_created_tables = set()
+_models_lock = threading.Lock()
+
+
+def _month(moment):
+    if tz.is_aware(moment):
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y_%m')
+
+
+def audit_model(month):
+    """Model class for the ``YYYY_MM`` audit table"""
+    with _models_lock:
+        model = _models.get(month)
+        if model is None:
+            meta = type('Meta', (), {
+                'app_label': APP_LABEL,
+                'apps': _apps,
+                'db_table': f'{TABLE_PREFIX}{month}',
+            })
+            model = type(f'AuthEvent_{month}', (models.Model,), {
+                '__module__': __name__,
+                'Meta': meta,
+                'id': models.BigAutoField(primary_key=True),
+                'created_at': models.DateTimeField(),
+                'event': models.CharField(max_length=32),
+                # Plain ids, not foreign keys: the trail outlives deleted accounts
+                'user_id': models.BigIntegerField(null=True, db_index=True),
+                'email': models.CharField(max_length=254, blank=True),
+                'ip': models.GenericIPAddressField(null=True),
+                'user_agent': models.CharField(max_length=255, blank=True),
+                'data': models.JSONField(default=dict),
+            })
+            _models[month] = model
+        return model
+
+
+def _database():
+    return getattr(settings, 'AUDIT_LOG_DATABASE', 'default')
+
+
+def audit_tables(using=None):
+    """Existing monthly audit tables, oldest first"""
+    connection = connections[using or _database()]
+    return sorted(name for name in connection.introspection.table_names() if name.startswith(TABLE_PREFIX))
+
+
+def _ensure_table(model, using):
+    table = model._meta.db_table
+    if (using, table) in _created_tables:
+        return
+    connection = connections[using]
+    if table not in connection.introspection.table_names():
+        try:
+            with connection.schema_editor() as editor:
+                editor.create_model(model)
+        except DatabaseError:
+            # Another worker created it first
+            if table not in connection.introspection.table_names():
+                raise
+    _created_tables.add((using, table))
+
+
+def write_events(events, using=None):
+    """Insert ``events`` with one bulk_create per month"""
+    using = using or _database()
+    by_month = {}
+    for event in events:
+        by_month.setdefault(_month(event['created_at']), []).append(event)
+    for month, rows in by_month.items():
+        model = audit_model(month)
+        _ensure_table(model, using)
+        model.objects.using(using).bulk_create([model(**row) for row in rows])
+
+
+def drop_audit_tables(before, using=None, dry_run=False):
+    """
+    Drop every monthly table older than the (UTC) month containing ``before``
+
+    Returns:
+        list: Names of the dropped tables
+    """
+    using = using or _database()
+    cutoff = f'{TABLE_PREFIX}{_month(before)}'
+    dropped = []
+    for table in audit_tables(using):
+        if table >= cutoff:
+            break
+        if dry_run:
+            dropped.append(table)
+            continue
+        model = audit_model(table[len(TABLE_PREFIX):])
+        with connections[using].schema_editor() as editor:
+            editor.delete_model(model)
+        _created_tables.discard((using, table))
+        dropped.append(table)
+    return dropped
+
+
+class AuditBuffer:
+    """
+    In-process queue of audit events, written in batches by a daemon thread.
+
+    ``add`` only appends to a list; the thread flushes when ``batch_size``
+    events are waiting or ``flush_seconds`` after the first one arrived.
+    Events that fail to write are retried on the next flush, up to
+    ``max_pending`` (then the oldest are dropped with a warning).
+    """
+
+    def __init__(self, batch_size=500, flush_seconds=2.0, max_pending=50000):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def add(self, event):
+        with self._lock:
+            self._pending.append(event)
+            size = len(self._pending)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+                self._thread.start()
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far; returns the number of events written"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._pending = self._pending, []
+            if not events:
+                return 0
+            written = 0
+            try:
+                while written < len(events):
+                    write_events(events[written:written + self.batch_size])
+                    written += self.batch_size
+                return len(events)
+            except Exception as e:
+                print(f"Error writing audit events: {e}")
+                with self._lock:
+                    self._pending[:0] = events[written:]
+                    overflow = len(self._pending) - self.max_pending
+                    if overflow > 0:
+                        del self._pending[:overflow]
+                        print(f"Warning: dropped {overflow} audit events")
+                return written
+            finally:
+                if threading.current_thread() is self._thread:
+                    connections.close_all()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_audit_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = AuditBuffer(
+                batch_size=getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 500),
+                flush_seconds=getattr(settings, 'AUDIT_LOG_FLUSH_SECONDS', 2),
+                max_pending=getattr(settings, 'AUDIT_LOG_MAX_PENDING', 50000)
+            )
+            atexit.register(_buffer.flush)
+    return _buffer
+
+
+def _client_ip(request):
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded and getattr(settings, 'AUDIT_LOG_TRUST_X_FORWARDED_FOR', False):
+        return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR') or None
+
+
+def audit(event, request=None, user=None, email='', **data):
+    """Queue an audit event; never touches the database on the caller's thread"""
+    if not getattr(settings, 'AUDIT_LOG_ENABLED', True):
+        return
+    get_audit_buffer().add({
+        'created_at': tz.now(),
+        'event': event,
+        'user_id': getattr(user, 'pk', user),
+        'email': email or getattr(user, 'email', '') or '',
+        'ip': _client_ip(request) if request is not None else None,
+        'user_agent': request.META.get('HTTP_USER_AGENT', '')[:255] if request is not None else '',
+        'data': data,
+    })
@@ -0,0 +1,31 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .models import User
+from .sharding import shard_for_email, shard_for_user
+
+
+class LeanModelBackend(ModelBackend):
+    """ModelBackend that loads users through User.auth_objects (auth columns only)"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User.auth_objects.db_manager(shard_for_email(username)).get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        try:
+            user = User.auth_objects.using(shard_for_user(user_id)).get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone as tz
+from django.utils.module_loading import import_string
+
+from .models import UserProfile
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+
+
+def digest_frequency(profile):
+    preferences = getattr(profile, 'communication_preferences', None) or {}
+    return preferences.get('digest_frequency', getattr(settings, 'DIGEST_DEFAULT_FREQUENCY', None))
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def next_digest_time(time_zone, frequency, after=None):
+    """
+    Next send time (UTC) strictly after ``after`` for a user's digest
+
+    Digests go out at DIGEST_SEND_HOUR local time, every day or, for weekly
+    digests, on DIGEST_WEEKLY_DAY (0 = Monday). Unknown frequencies and
+    "never" return None.
+    """
+    if frequency not in (DAILY, WEEKLY):
+        return None
+    after = after or tz.now()
+    zone = _zone(time_zone)
+    local = after.astimezone(zone)
+    day = local.date()
+    while True:
+        candidate = datetime(day.year, day.month, day.day, getattr(settings, 'DIGEST_SEND_HOUR', 8), tzinfo=zone)
+        if candidate > local and (frequency == DAILY or day.weekday() == getattr(settings, 'DIGEST_WEEKLY_DAY', 0)):
+            return candidate.astimezone(timezone.utc)
+        day += timedelta(days=1)
+
+
+def schedule_profile(profile, user=None, after=None):
+    """Set ``profile.next_digest_at`` from the user's time zone and digest preference (not saved)"""
+    user = user or profile.user
+    profile.next_digest_at = next_digest_time(user.time_zone, digest_frequency(profile), after)
+    return profile.next_digest_at
+
+
+def build_digest_email(profile, connection=None):
+    """Default DIGEST_MESSAGE_BUILDER; return None to skip a user this round"""
+    user = profile.user
+    frequency = digest_frequency(profile)
+    subject = "Your weekly digest" if frequency == WEEKLY else "Your daily digest"
+    message = f"Hi {user.first_name or user.email},\n\nHere is what happened in your workspace since your last digest.\n"
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], connection=connection)
+
+
+def _builder():
+    path = getattr(settings, 'DIGEST_MESSAGE_BUILDER', None)
+    return import_string(path) if path else build_digest_email
+
+
+def due_profiles(now=None, using=DEFAULT_DB_ALIAS):
+    """Profiles on ``using`` whose digest is due, oldest first (a range scan on the next_digest_at index)"""
+    return (
+        UserProfile.objects.using(using).select_related('user')
+        .filter(next_digest_at__lte=now or tz.now())
+        .order_by('next_digest_at')
+    )
+
+
+def send_due_digests(now=None, batch_size=500, dry_run=False, log=print, using=DEFAULT_DB_ALIAS):
+    """
+    Send every digest due at ``now`` on database ``using`` in batches of ``batch_size``
+
+    Each batch is sent over one SMTP connection, then its profiles are moved
+    to their next send time with one bulk_update, which also takes them out
+    of the due range. Inactive or unverified users are rescheduled without
+    an email. Work per tick is proportional to the number of digests due,
+    not to the number of users. Under sharding, call it once per alias of
+    sharding.user_databases().
+
+    Returns:
+        dict: Counts of ``sent``, ``skipped`` and ``failed`` digests
+    """
+    now = now or tz.now()
+    if dry_run:
+        count = due_profiles(now, using).count()
+        log(f"{count} digests due at {now:%Y-%m-%d %H:%M} UTC")
+        return {'sent': 0, 'skipped': 0, 'failed': 0, 'due': count}
+
+    build = _builder()
+    totals = {'sent': 0, 'skipped': 0, 'failed': 0}
+    mail = get_connection()
+    try:
+        while True:
+            batch = list(due_profiles(now, using)[:batch_size])
+            if not batch:
+                break
+            messages = []
+            for profile in batch:
+                user = profile.user
+                if not user.is_active or not user.email_verified:
+                    totals['skipped'] += 1
+                else:
+                    message = build(profile, connection=mail)
+                    if message is None:
+                        totals['skipped'] += 1
+                    else:
+                        messages.append(message)
+                schedule_profile(profile, user, after=now)
+
+            try:
+                sent = mail.send_messages(messages) if messages else 0
+            except Exception as e:
+                # Keep the batch due so the next tick retries it
+                print(f"Error sending digest emails: {e}")
+                totals['failed'] += len(messages)
+                break
+            totals['sent'] += sent or 0
+            UserProfile.objects.using(using).bulk_update(batch, ['next_digest_at'])
+            log(f"  batch: {len(messages)} digests sent, {len(batch) - len(messages)} skipped")
+            if len(batch) < batch_size:
+                break
+    finally:
+        mail.close()
+    return totals
+
+
+def reschedule_all(batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """Recompute next_digest_at for every profile on ``using`` (e.g. after changing DIGEST_SEND_HOUR)"""
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            UserProfile.objects.using(using).select_related('user').filter(pk__gt=last_pk).order_by('pk')[:batch_size]
+        )
+        if not batch:
+            return total
+        for profile in batch:
+            schedule_profile(profile)
+        UserProfile.objects.using(using).bulk_update(batch, ['next_digest_at'])
+        total += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,60 @@
+import hashlib
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .hash_files import EMAIL_DOMAINS_MAGIC, open_hash_file
+
+# Bytes of each domain's SHA-1 kept in the blocklist file (64 bits)
+DOMAIN_WIDTH = 8
+
+_missing_reported = set()
+
+
+def normalize_domain(domain):
+    domain = domain.strip().lower()
+    if domain.startswith('*.'):
+        domain = domain[2:]
+    domain = domain.strip('.')
+    try:
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return domain
+
+
+def domain_digest(domain):
+    return hashlib.sha1(domain.encode('utf-8')).digest()[:DOMAIN_WIDTH]
+
+
+def _blocklist():
+    path = getattr(settings, 'EMAIL_DOMAIN_BLOCKLIST', None)
+    if not path:
+        return None
+    try:
+        return open_hash_file(path, EMAIL_DOMAINS_MAGIC, check_interval=getattr(settings, 'EMAIL_DOMAIN_BLOCKLIST_CHECK_SECONDS', 30))
+    except FileNotFoundError:
+        if path not in _missing_reported:
+            print(f"Warning: email domain blocklist {path} not found, skipping the check")
+            _missing_reported.add(path)
+        return None
+
+
+def is_blocked_domain(domain):
+    """
+    Whether ``domain`` or any of its parent domains is on the blocklist.
+
+    "a.b.mailinator.com" is checked as itself, "b.mailinator.com",
+    "mailinator.com" and "com": one memory-mapped lookup each.
+    """
+    blocklist = _blocklist()
+    if blocklist is None:
+        return False
+    labels = normalize_domain(domain).split('.')
+    return any(domain_digest('.'.join(labels[i:])) in blocklist for i in range(len(labels)))
+
+
+def validate_email_domain(email):
+    domain = email.rpartition('@')[2]
+    if domain and is_blocked_domain(domain):
+        raise serializers.ValidationError("Email addresses from this domain are not accepted.")
+    return email
@@ -0,0 +1,173 @@
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+
+# File layout: header, then a fanout table giving, for every 2-byte hash
+# prefix, the index of its first record (65536 + 1 entries), then the sorted
+# fixed-width hash prefixes themselves. The magic says what the hashes are,
+# so one kind of file is never loaded as the other.
+BREACHED_PASSWORDS_MAGIC = b'PWNDSHA1'
+EMAIL_DOMAINS_MAGIC = b'BLKDOMS1'
+KINDS = {
+    BREACHED_PASSWORDS_MAGIC: 'breached password file',
+    EMAIL_DOMAINS_MAGIC: 'email domain blocklist',
+}
+VERSION = 1
+HEADER = struct.Struct('<8sHHQ4x')
+FANOUT_ENTRIES = 65536 + 1
+FANOUT = struct.Struct(f'<{FANOUT_ENTRIES}Q')
+RECORDS_OFFSET = HEADER.size + FANOUT.size
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+class SortedHashFile:
+    """
+    Read-only set of fixed-width hash prefixes stored in a sorted file.
+
+    The file is memory-mapped, so its pages live in the OS page cache and are
+    shared by every worker process; nothing is loaded up front. A lookup reads
+    two fanout entries and binary-searches one bucket, i.e. a handful of page
+    touches.
+    """
+
+    def __init__(self, path, magic):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        found, version, self.width, self.count = HEADER.unpack_from(self.map, 0)
+        if found != magic:
+            if found in KINDS:
+                raise ImproperlyConfigured(f"{path} is the wrong kind of file ({KINDS[found]}, expected {KINDS[magic]})")
+            raise ImproperlyConfigured(f"{path} is not a sorted hash file")
+        if version != VERSION:
+            raise ImproperlyConfigured(f"{path}: unsupported version {version}")
+        if len(self.map) != RECORDS_OFFSET + self.count * self.width:
+            raise ImproperlyConfigured(f"{path} is truncated")
+
+    def _record(self, index):
+        start = RECORDS_OFFSET + index * self.width
+        return self.map[start:start + self.width]
+
+    def __contains__(self, digest):
+        key = digest[:self.width]
+        bucket = int.from_bytes(key[:2], 'big')
+        lo, hi = struct.unpack_from('<2Q', self.map, HEADER.size + bucket * 8)
+        end = hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < end and self._record(lo) == key
+
+
+def open_hash_file(path, magic, check_interval=None):
+    """
+    Return the (shared, cached) SortedHashFile for ``path``, which must have
+    been written with ``magic``
+
+    With ``check_interval``, the file is re-opened when it was replaced on
+    disk (checked at most every ``check_interval`` seconds). Writers replace
+    the file atomically, and the swap here is a single assignment, so
+    lookups see either the old or the new set, never a mix.
+
+    Raises:
+        FileNotFoundError: if the file does not exist
+        ImproperlyConfigured: if it is another kind of file
+    """
+    key = (os.fspath(path), magic)
+    path = key[0]
+    entry = _files.get(key)
+    now = time.monotonic()
+    if entry is not None and (check_interval is None or now - entry[1] < check_interval):
+        return entry[0]
+    with _files_lock:
+        entry = _files.get(key)
+        if entry is not None:
+            stat = os.stat(path)
+            if (stat.st_ino, stat.st_mtime_ns) == entry[0].identity:
+                _files[key] = (entry[0], now)
+                return entry[0]
+        hash_file = SortedHashFile(path, magic)
+        _files[key] = (hash_file, now)
+        return hash_file
+
+
+def _read_run(path, width, buffer_records=65536):
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(width * buffer_records)
+            if not data:
+                return
+            for start in range(0, len(data), width):
+                yield data[start:start + width]
+
+
+def _write_run(directory, index, records):
+    records.sort()
+    path = os.path.join(directory, f'run{index}.bin')
+    with open(path, 'wb') as f:
+        f.write(b''.join(records))
+    return path
+
+
+def write_hash_file(output, digests, width, magic, chunk_records=5000000):
+    """
+    Write ``digests`` (any order, duplicates allowed) as a sorted hash file
+    of the kind ``magic`` (BREACHED_PASSWORDS_MAGIC or EMAIL_DOMAINS_MAGIC)
+
+    Input is sorted in chunks of ``chunk_records`` into runs on disk that are
+    then merged, so memory stays bounded. The file is written next to
+    ``output`` and moved into place atomically.
+
+    Returns:
+        int: Number of distinct records written
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = []
+        chunk = []
+        for digest in digests:
+            chunk.append(digest[:width])
+            if len(chunk) >= chunk_records:
+                runs.append(_write_run(tmp, len(runs), chunk))
+                chunk = []
+        if chunk or not runs:
+            runs.append(_write_run(tmp, len(runs), chunk))
+
+        fanout = [0] * FANOUT_ENTRIES
+        count = 0
+        previous = None
+        tmp_output = f"{output}.tmp"
+        with open(tmp_output, 'wb') as out:
+            out.write(b'\0' * RECORDS_OFFSET)
+            buffer = []
+            for record in heapq.merge(*(_read_run(run, width) for run in runs)):
+                if record == previous:
+                    continue
+                previous = record
+                fanout[int.from_bytes(record[:2], 'big') + 1] += 1
+                buffer.append(record)
+                count += 1
+                if len(buffer) >= 65536:
+                    out.write(b''.join(buffer))
+                    buffer = []
+            out.write(b''.join(buffer))
+
+            # Per-prefix counts -> index of the first record of every prefix
+            for index in range(1, FANOUT_ENTRIES):
+                fanout[index] += fanout[index - 1]
+            out.seek(0)
+            out.write(HEADER.pack(magic, VERSION, width, count))
+            out.write(FANOUT.pack(*fanout))
+        os.replace(tmp_output, output)
+    return count
@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Duplicates waiting in this process are woken as soon as the first request
+# finishes; waiters in other processes poll the cache.
+_waiters = {}
+_waiters_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE_ALIAS', 'default')]
+
+
+def _fingerprint(request):
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode('utf-8'))
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _wait(key, timeout):
+    with _waiters_lock:
+        event = _waiters.setdefault(key, threading.Event())
+    event.wait(timeout)
+
+
+def _wake(key):
+    with _waiters_lock:
+        event = _waiters.pop(key, None)
+    if event is not None:
+        event.set()
+
+
+def _replay(stored):
+    response = Response(stored['data'], status=stored['status'], headers=stored['headers'])
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _error(message, status_code, **headers):
+    return Response({"error": message}, status=status_code, headers=headers)
+
+
+def _lookup_or_claim(cache, result_key, lock_key, fingerprint):
+    """The stored (or an error) response, or None once this request owns the key"""
+    wait_seconds = getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        stored = cache.get(result_key)
+        if stored is not None:
+            if stored['fingerprint'] != fingerprint:
+                return _error(
+                    "Idempotency-Key was already used for a different request.",
+                    status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            return _replay(stored)
+        if cache.add(lock_key, fingerprint, getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 60)):
+            return None
+        if cache.get(lock_key) not in (None, fingerprint):
+            return _error(
+                "Idempotency-Key is in use by a different request.",
+                status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return _error(
+                "A request with this Idempotency-Key is still in progress.",
+                status.HTTP_409_CONFLICT,
+                **{'Retry-After': str(max(1, int(wait_seconds)))}
+            )
+        _wait(result_key, min(remaining, 0.05))
+
+
+def idempotent(scope):
+    """
+    Make a view method replay its first response for a repeated ``Idempotency-Key``
+
+    The first request with a key runs the view and its response (anything
+    below 500) is kept for IDEMPOTENCY_TTL_SECONDS. Retries get that response
+    back from the cache, marked with ``Idempotent-Replayed: true``. A retry
+    arriving while the first request is still running waits for its result
+    (up to IDEMPOTENCY_WAIT_SECONDS, then 409) instead of running the view
+    again. Reusing a key for a different request body is rejected with 422.
+    Requests without the header are not affected. Use a shared cache (e.g.
+    Redis) so duplicates reaching different workers are recognized::
+
+        @idempotent('register')
+        def post(self, request):
+            ...
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.META.get(HEADER)
+            if not key or not getattr(settings, 'IDEMPOTENCY_ENABLED', True):
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error("Idempotency-Key is too long.", status.HTTP_400_BAD_REQUEST)
+
+            cache = _cache()
+            fingerprint = _fingerprint(request)
+            result_key = f'idem:{scope}:{hashlib.sha256(key.encode("utf-8")).hexdigest()}'
+            lock_key = f'{result_key}:lock'
+            response = _lookup_or_claim(cache, result_key, lock_key, fingerprint)
+            if response is not None:
+                # Also drops this process's waiter entry for the key
+                _wake(result_key)
+                return response
+
+            try:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    cache.set(result_key, {
+                        'fingerprint': fingerprint,
+                        'status': response.status_code,
+                        'data': response.data,
+                        'headers': dict(response.items()),
+                    }, getattr(settings, 'IDEMPOTENCY_TTL_SECONDS', 86400))
+                return response
+            finally:
+                # A failed (5xx) or crashed request leaves nothing behind, so a retry runs again
+                cache.delete(lock_key)
+                _wake(result_key)
+        return wrapper
+    return decorator
@@ -0,0 +1,43 @@
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .token_families import FAMILY_CLAIM, revoked_sessions
+
+
+def introspect_tokens(raw_tokens):
+    """
+    Introspect a batch of access tokens (RFC 7662 style)
+
+    Signatures and expiry are checked locally per token. Revocation (user
+    deactivated or deleted, session logged out) is then checked for the whole
+    batch at once, see revoked_sessions.
+
+    Returns:
+        list: One dict per token, in order: ``{'active': False}`` or
+        ``{'active': True, **claims}`` with the user id as a string
+    """
+    tokens = []
+    for raw in raw_tokens:
+        try:
+            tokens.append(AccessToken(raw))
+        except TokenError:
+            tokens.append(None)
+
+    sessions = {
+        (token.get(api_settings.USER_ID_CLAIM), token.get(FAMILY_CLAIM))
+        for token in tokens if token is not None
+    }
+    revoked = revoked_sessions(sessions) if sessions else set()
+
+    results = []
+    for token in tokens:
+        if token is None or (token.get(api_settings.USER_ID_CLAIM), token.get(FAMILY_CLAIM)) in revoked:
+            results.append({'active': False})
+        else:
+            claims = dict(token.payload)
+            if api_settings.USER_ID_CLAIM in claims:
+                # Tokens minted before ids were strings carry an int
+                claims[api_settings.USER_ID_CLAIM] = str(claims[api_settings.USER_ID_CLAIM])
+            results.append({'active': True, **claims})
+    return results
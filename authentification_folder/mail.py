@@ -0,0 +1,188 @@
+import smtplib
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.mail.backends.smtp import EmailBackend
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+STATS = ('succeeded', 'failed', 'rejected', 'opened')
+
+# Errors about one message; the server itself answered, so they do not trip the breaker
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class MailCircuitOpen(smtplib.SMTPException):
+    """Raised instead of contacting the SMTP server while the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Failure counter shared by every worker through a cache.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    ``allow`` refuses calls for ``reset_seconds``. Then one caller at a time
+    (across workers) is let through as a probe: success closes the circuit,
+    failure opens it for another period. ``allow`` returns a ticket that the
+    caller hands back to ``record_success`` / ``record_failure``, so only the
+    admitted probe decides; late outcomes of calls that started before the
+    circuit opened are just counted. Outcomes are counted in the cache for
+    monitoring (see ``stats``).
+    """
+
+    def __init__(self, name, cache_alias='default', failure_threshold=5, reset_seconds=60):
+        self.cache = caches[cache_alias]
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+    def _key(self, suffix):
+        return f'circuit:{self.name}:{suffix}'
+
+    def _count(self, stat):
+        key = self._key(f'stat:{stat}')
+        if not self.cache.add(key, 1, None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.add(key, 1, None)
+
+    def state(self):
+        opened_at = self.cache.get(self._key('opened_at'))
+        if opened_at is None:
+            return CLOSED
+        return OPEN if time.time() < opened_at + self.reset_seconds else HALF_OPEN
+
+    def allow(self):
+        """False when the call must not be made, else a (truthy) ticket for record_*"""
+        state = self.state()
+        if state == CLOSED:
+            return True
+        # Half-open: a single probe; it holds the slot until it reports back
+        if state == HALF_OPEN:
+            probe = uuid4().hex
+            if self.cache.add(self._key('probe'), probe, self.reset_seconds):
+                return probe
+        self._count('rejected')
+        return False
+
+    def _is_probe(self, ticket):
+        return isinstance(ticket, str) and self.cache.get(self._key('probe')) == ticket
+
+    def record_success(self, ticket=True):
+        self._count('succeeded')
+        if self.cache.get(self._key('opened_at')) is not None:
+            # Only the half-open probe closes the circuit
+            if self._is_probe(ticket):
+                self.cache.delete_many([self._key('failures'), self._key('opened_at'), self._key('probe')])
+        elif self.cache.get(self._key('failures')):
+            self.cache.delete(self._key('failures'))
+
+    def record_failure(self, ticket=True):
+        self._count('failed')
+        if self.cache.get(self._key('opened_at')) is not None:
+            if self._is_probe(ticket):
+                # The half-open probe failed
+                self._open()
+            return
+        key = self._key('failures')
+        if self.cache.add(key, 1, self.reset_seconds * 10):
+            failures = 1
+        else:
+            try:
+                failures = self.cache.incr(key)
+            except ValueError:
+                failures = 1
+        if failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.cache.set(self._key('opened_at'), time.time(), None)
+        self.cache.delete(self._key('probe'))
+        self._count('opened')
+
+    def stats(self):
+        counts = self.cache.get_many([self._key(f'stat:{stat}') for stat in STATS])
+        return {
+            'state': self.state(),
+            'consecutive_failures': self.cache.get(self._key('failures')) or 0,
+            **{stat: counts.get(self._key(f'stat:{stat}'), 0) for stat in STATS},
+        }
+
+
+_breaker = None
+
+
+def get_mail_breaker():
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(
+            'smtp',
+            cache_alias=getattr(settings, 'EMAIL_CIRCUIT_CACHE_ALIAS', 'default'),
+            failure_threshold=getattr(settings, 'EMAIL_CIRCUIT_FAILURE_THRESHOLD', 5),
+            reset_seconds=getattr(settings, 'EMAIL_CIRCUIT_RESET_SECONDS', 60)
+        )
+    return _breaker
+
+
+class ResilientEmailBackend(EmailBackend):
+    """
+    SMTP backend with bounded waits and a shared circuit breaker.
+
+    Connecting is limited to EMAIL_CONNECT_TIMEOUT and every later socket
+    operation to EMAIL_TIMEOUT. While the circuit is open, sends raise
+    MailCircuitOpen (or return 0 with fail_silently) without touching the
+    network, so an SMTP outage costs callers a cache lookup instead of a
+    blocked worker. Callers that retry later (digests, password reset
+    requests) pick the mail up once the circuit closes.
+    """
+
+    def __init__(self, *args, connect_timeout=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.timeout is None:
+            self.timeout = 10
+        self.connect_timeout = connect_timeout or getattr(settings, 'EMAIL_CONNECT_TIMEOUT', 5)
+        self.breaker = get_mail_breaker()
+
+    def open(self):
+        if self.connection:
+            return False
+        send_timeout = self.timeout
+        self.timeout = min(self.connect_timeout, send_timeout)
+        try:
+            opened = super().open()
+        finally:
+            self.timeout = send_timeout
+        if self.connection is not None and self.connection.sock is not None:
+            self.connection.sock.settimeout(send_timeout)
+        return opened
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        ticket = self.breaker.allow()
+        if not ticket:
+            if self.fail_silently:
+                return 0
+            raise MailCircuitOpen("SMTP circuit is open; not contacting the mail server")
+        fail_silently, self.fail_silently = self.fail_silently, False
+        try:
+            sent = super().send_messages(email_messages)
+        except MESSAGE_ERRORS:
+            self.breaker.record_success(ticket)
+            if fail_silently:
+                return 0
+            raise
+        except Exception:
+            self.breaker.record_failure(ticket)
+            if fail_silently:
+                return 0
+            raise
+        finally:
+            self.fail_silently = fail_silently
+        self.breaker.record_success(ticket)
+        return sent
@@ -0,0 +1,122 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone as tz
+
+from .models import UsedToken, User, UserProfile
+
+
+def _reclaimed_bytes(user_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Size of the User and UserProfile rows about to be deleted
+
+    Exact (pg_column_size) on PostgreSQL, an estimate from the column
+    values elsewhere. Index entries are not included.
+    """
+    tables = [(User, 'id'), (UserProfile, 'user_id')]
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        total = 0
+        with connection.cursor() as cursor:
+            for model, column in tables:
+                cursor.execute(
+                    f'SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {connection.ops.quote_name(model._meta.db_table)} t '
+                    f'WHERE t.{connection.ops.quote_name(column)} = ANY(%s)',
+                    [list(user_ids)]
+                )
+                total += cursor.fetchone()[0]
+        return total, True
+
+    total = 0
+    for model, column in tables:
+        fields = [field.attname for field in model._meta.concrete_fields]
+        for row in model.objects.using(using).filter(**{f'{column}__in': user_ids}).values_list(*fields):
+            total += sum(len(str(value)) for value in row if value is not None)
+    return total, False
+
+
+def purge_unverified_users(older_than=None, batch_size=500, pause=0.5, max_batches=None, dry_run=False, log=print,
+                           using=DEFAULT_DB_ALIAS):
+    """
+    Delete accounts that never verified their email, in small batches
+
+    Each batch selects at most ``batch_size`` ids through the
+    (email_verified, date_joined) index and deletes them in its own short
+    transaction, then sleeps ``pause`` seconds so locks stay short and
+    replicas can keep up. Staff and superusers are never purged.
+
+    Only the database ``using`` is purged: under sharding, call it once
+    per alias of sharding.user_databases().
+
+    Args:
+        older_than (timedelta): Minimum account age (default: PURGE_UNVERIFIED_AFTER_DAYS)
+        batch_size (int): Accounts per batch
+        pause (float): Seconds to sleep between batches
+        max_batches (int): Stop after this many batches (None: until done)
+        dry_run (bool): Only count what would be deleted
+        log (callable): Progress output
+        using (str): Database alias holding the users
+
+    Returns:
+        dict: ``users``, ``rows`` (per model), ``bytes`` and whether the
+        byte count is ``exact``
+    """
+    if older_than is None:
+        older_than = timedelta(days=getattr(settings, 'PURGE_UNVERIFIED_AFTER_DAYS', 7))
+    cutoff = tz.now() - older_than
+    stale = User.objects.using(using).filter(
+        email_verified=False,
+        date_joined__lt=cutoff,
+        is_staff=False,
+        is_superuser=False
+    )
+
+    if dry_run:
+        count = stale.count()
+        log(f"{count} unverified accounts joined before {cutoff:%Y-%m-%d %H:%M}")
+        return {'users': count, 'rows': {}, 'bytes': 0, 'exact': True}
+
+    rows = Counter()
+    users = 0
+    reclaimed = 0
+    exact = True
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic(using=using):
+            ids = list(stale.order_by('date_joined').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            size, batch_exact = _reclaimed_bytes(ids, using)
+            # Re-check the conditions: a user may have verified since the ids were read
+            deleted, per_model = stale.filter(pk__in=ids).delete()
+
+        users += per_model.get(User._meta.label, 0)
+        rows.update(per_model)
+        reclaimed += size
+        exact = exact and batch_exact
+        batches += 1
+        log(f"  batch {batches}: {per_model.get(User._meta.label, 0)} accounts, {deleted} rows")
+        if len(ids) < batch_size:
+            break
+        time.sleep(pause)
+
+    return {'users': users, 'rows': dict(rows), 'bytes': reclaimed, 'exact': exact}
+
+
+def prune_used_tokens(batch_size=1000):
+    """
+    Delete UsedToken rows whose token has expired (they can no longer be replayed)
+
+    UsedToken is not sharded: it always lives on the primary (see
+    routers.PRIMARY_MODELS), so one pass covers every user.
+    """
+    expired = UsedToken.objects.filter(expires_at__lt=tz.now())
+    total = 0
+    while True:
+        jtis = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not jtis:
+            return total
+        total += UsedToken.objects.filter(pk__in=jtis).delete()[0]
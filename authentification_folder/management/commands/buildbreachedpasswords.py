@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentification.hash_files import BREACHED_PASSWORDS_MAGIC, RECORDS_OFFSET, write_hash_file
+from authentification.password_validation import DEFAULT_WIDTH
+
+
+class Command(BaseCommand):
+    help = 'Convert a Have I Been Pwned style SHA-1 dump (HASH:COUNT lines) into the breached password lookup file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Text dump, one SHA-1 hex digest per line, optionally followed by :COUNT")
+        parser.add_argument('--output', default='breached-passwords.bin', help="File to write")
+        parser.add_argument('--width', type=int, default=DEFAULT_WIDTH,
+        help="Bytes of each SHA-1 to keep (10 = 80 bits; smaller files, more false positives)")
+        parser.add_argument('--min-count', type=int, default=1, help="Skip hashes seen fewer times than this")
+        parser.add_argument('--chunk-records', type=int, default=5000000, help="Records sorted in memory at a time")
+
+    def handle(self, *args, **options):
+        width = options['width']
+        if not 3 <= width <= 20:
+            raise CommandError("--width must be between 3 and 20")
+        started = time.perf_counter()
+
+        self.skipped = 0
+        count = write_hash_file(
+            options['output'],
+            self._digests(options['source'], width, options['min_count']),
+            width,
+            BREACHED_PASSWORDS_MAGIC,
+            options['chunk_records']
+        )
+
+        size = RECORDS_OFFSET + count * width
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count:,} hashes ({self.skipped:,} below --min-count skipped) to {options['output']}: "
+            f"{size / 1024 / 1024:,.1f} MiB in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def _digests(self, source_path, width, min_count):
+        with open(source_path, 'r', encoding='ascii', errors='replace') as source:
+            for line in source:
+                digest, _, count = line.strip().partition(':')
+                if not digest:
+                    continue
+                if min_count > 1 and (not count or int(count) < min_count):
+                    self.skipped += 1
+                    continue
+                try:
+                    if len(digest) < width * 2:
+                        raise ValueError
+                    yield bytes.fromhex(digest[:width * 2])
+                except ValueError:
+                    raise CommandError(f"Not a SHA-1 hex digest: {digest[:60]!r}")
@@ -0,0 +1,105 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter (python -X importtime) and reports its timings as JSON
+PROBE = """
+import importlib, json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.conf import settings
+importlib.import_module(settings.ROOT_URLCONF)
+urls_done = time.perf_counter()
+from django.test import Client
+from django.urls import reverse
+client = Client()
+request_started = time.perf_counter()
+response = client.get(reverse(sys.argv[1]))
+done = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (setup_done - started) * 1000,
+    'urls_ms': (urls_done - setup_done) * 1000,
+    'first_request_ms': (done - request_started) * 1000,
+    'status': response.status_code,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """``python -X importtime`` output -> list of (module, self_us, cumulative_us, depth)"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Measure worker cold start: import time and time to the first request in a fresh interpreter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help="Fresh interpreters to start (the median is reported)")
+        parser.add_argument('--url-name', default='login', help="URL name requested as the first request")
+        parser.add_argument('--top', type=int, default=10, help="Slowest top-level imports to list")
+        parser.add_argument('--budget-ms', type=float,
+        help="Fail when the median time to first request exceeds this (default: COLD_START_BUDGET_MS, 0 disables)")
+
+    def _probe(self, url_name):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, url_name],
+            capture_output=True, text=True, env=os.environ.copy()
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Cold start probe failed:\n{result.stderr[-2000:]}")
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        return timings, parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError("--runs must be positive")
+        budget = options['budget_ms']
+        if budget is None:
+            budget = getattr(settings, 'COLD_START_BUDGET_MS', 0)
+
+        runs = [self._probe(options['url_name']) for _ in range(options['runs'])]
+        timings = {
+            key: statistics.median(run[key] for run, _ in runs)
+            for key in ('setup_ms', 'urls_ms', 'first_request_ms')
+        }
+        total = sum(timings.values())
+
+        # Import breakdown from the last run (caches are warm by then, like a rolling restart)
+        modules = runs[-1][1]
+        top_level = {}
+        for name, _, cumulative, depth in modules:
+            if depth == 0:
+                root = name.partition('.')[0]
+                top_level[root] = top_level.get(root, 0) + cumulative
+        app_label = __name__.split('.')[0]
+        app_us = sum(self_us for name, self_us, _, _ in modules if name.partition('.')[0] == app_label)
+
+        self.stdout.write(f"Imports by top-level package (cumulative, {len(modules)} modules):")
+        for root, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {root:<32} {cumulative / 1000:8.1f} ms")
+        self.stdout.write(f"  {app_label + ' (own code)':<32} {app_us / 1000:8.1f} ms")
+        self.stdout.write(
+            f"django.setup() {timings['setup_ms']:.0f} ms, URLconf {timings['urls_ms']:.0f} ms, "
+            f"first request {timings['first_request_ms']:.0f} ms (HTTP {runs[-1][0]['status']})"
+        )
+
+        if budget and total > budget:
+            raise CommandError(f"Cold start took {total:.0f} ms, over the {budget:.0f} ms budget")
+        self.stdout.write(self.style.SUCCESS(
+            f"Time to first request: {total:.0f} ms (median of {options['runs']})"
+            + (f", budget {budget:.0f} ms" if budget else "")
+        ))
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from authentification.audit import drop_audit_tables
+
+
+class Command(BaseCommand):
+    help = 'Drop whole monthly audit log tables older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, help="Months to keep before the current one (default: AUDIT_LOG_RETENTION_MONTHS)")
+        parser.add_argument('--database', help="Database alias (default: AUDIT_LOG_DATABASE)")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the tables that would be dropped")
+
+    def handle(self, *args, **options):
+        months = options['months']
+        if months is None:
+            months = getattr(settings, 'AUDIT_LOG_RETENTION_MONTHS', 12)
+        if months < 0:
+            raise CommandError("--months cannot be negative")
+
+        # Tables are named after UTC months
+        now = datetime.now(timezone.utc)
+        index = now.year * 12 + now.month - 1 - months
+        cutoff = datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+        dropped = drop_audit_tables(cutoff, options['database'], dry_run=options['dry_run'])
+        for table in dropped:
+            self.stdout.write(f"  {'would drop' if options['dry_run'] else 'dropped'} {table}")
+        if options['dry_run']:
+            self.stdout.write(f"{len(dropped)} audit tables older than {cutoff:%Y-%m}")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Dropped {len(dropped)} audit tables older than {cutoff:%Y-%m}"))
@@ -0,0 +1,54 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentification.maintenance import prune_used_tokens, purge_unverified_users
+from authentification.sharding import frozen_buckets, sharding_enabled, user_databases
+
+
+class Command(BaseCommand):
+    help = 'Delete accounts that never verified their email (and expired used-token records), in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, help="Minimum account age in days (default: PURGE_UNVERIFIED_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Accounts deleted per transaction")
+        parser.add_argument('--pause', type=float, default=0.5, help="Seconds to sleep between batches")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches (per database)")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the accounts that would be deleted")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        older_than = timedelta(days=options['days']) if options['days'] is not None else None
+        if sharding_enabled() and frozen_buckets(refresh=True):
+            raise CommandError("rebalanceusers is moving buckets, try again once it has finished")
+
+        result = {'users': 0, 'rows': Counter(), 'bytes': 0, 'exact': True}
+        for alias in user_databases():
+            if sharding_enabled():
+                self.stdout.write(f"Shard {alias}:")
+            purged = purge_unverified_users(
+                older_than=older_than,
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                max_batches=options['max_batches'],
+                dry_run=options['dry_run'],
+                log=self.stdout.write,
+                using=alias
+            )
+            result['users'] += purged['users']
+            result['rows'].update(purged['rows'])
+            result['bytes'] += purged['bytes']
+            result['exact'] = result['exact'] and purged['exact']
+        if options['dry_run']:
+            return
+
+        for label, count in sorted(result['rows'].items()):
+            self.stdout.write(f"  {label}: {count} rows")
+        self.stdout.write(f"  Expired used-token records removed: {prune_used_tokens(options['batch_size'])}")
+        size = f"{result['bytes'] / 1024:,.1f} KiB"
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {result['users']} unverified accounts, reclaimed "
+            f"{size if result['exact'] else '~' + size + ' (estimated)'} of row data"
+        ))
@@ -0,0 +1,162 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from authentification.models import RoleModel, TokenFamily, User, UserProfile
+from authentification.sharding import (
+    frozen_buckets, id_bucket, plan_rebalance, shard_map, write_shard_map,
+)
+
+
+def _user_batches(alias, buckets, batch_size):
+    """Ids of the users on ``alias`` whose bucket is in ``buckets``, in batches (keyset scan)"""
+    last_pk = 0
+    while True:
+        ids = list(
+            User.objects.using(alias).filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        last_pk = ids[-1]
+        chosen = [pk for pk in ids if id_bucket(pk) in buckets]
+        if chosen:
+            yield chosen
+
+
+def _sync_roles(shards):
+    """Copy roles missing on a shard from the default database (users reference them by id)"""
+    roles = list(RoleModel.objects.using(DEFAULT_DB_ALIAS).all())
+    for alias in shards:
+        if alias != DEFAULT_DB_ALIAS:
+            RoleModel.objects.using(alias).bulk_create(roles, ignore_conflicts=True)
+
+
+def _copy_users(ids, source, target):
+    """Copy users ``ids`` with their profile, token families and M2M links; safe to repeat"""
+    with transaction.atomic(using=target):
+        User.objects.using(target).bulk_create(User.objects.using(source).filter(pk__in=ids), ignore_conflicts=True)
+
+        # Profiles and M2M rows get new primary keys on the target (sequences are per database)
+        profiles = list(UserProfile.objects.using(source).filter(user_id__in=ids))
+        for profile in profiles:
+            profile.pk = None
+        UserProfile.objects.using(target).bulk_create(profiles, ignore_conflicts=True)
+        TokenFamily.objects.using(target).bulk_create(
+            TokenFamily.objects.using(source).filter(user_id__in=ids), ignore_conflicts=True
+        )
+        for field in User._meta.many_to_many:
+            through = field.remote_field.through
+            rows = list(through.objects.using(source).filter(**{f'{field.m2m_field_name()}_id__in': ids}))
+            for row in rows:
+                row.pk = None
+            through.objects.using(target).bulk_create(rows, ignore_conflicts=True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy roles to every shard, move users between AUTH_SHARDS so buckets are spread evenly, '
+        'then switch the shard map. Users of the moving buckets are read-only until the switch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', help="Comma-separated aliases to spread users over (default: AUTH_SHARDS)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Users copied per transaction")
+        parser.add_argument('--cleanup', action='store_true',
+        help="Only delete rows left on shards their bucket no longer maps to (e.g. after an interrupted run)")
+        parser.add_argument('--dry-run', action='store_true', help="Print the plan without moving anything")
+        parser.add_argument('--settle-seconds', type=float, default=2,
+        help="Extra wait after workers reload the shard map, for requests already in flight")
+
+    def handle(self, *args, **options):
+        path = getattr(settings, 'AUTH_SHARD_MAP_FILE', None)
+        if not path:
+            raise CommandError("AUTH_SHARD_MAP_FILE is not set")
+        shards = options['shards'].split(',') if options['shards'] else list(getattr(settings, 'AUTH_SHARDS', []))
+        if not shards:
+            raise CommandError("No shards: set AUTH_SHARDS or pass --shards")
+        unknown = set(shards) - set(settings.DATABASES)
+        if unknown:
+            raise CommandError(f"Unknown database aliases: {', '.join(sorted(unknown))}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        current = shard_map(refresh=True)
+        if not options['dry_run']:
+            _sync_roles(shards)
+        if options['cleanup']:
+            self._cleanup(current, set(current) | set(shards), options['batch_size'], options['dry_run'])
+            return
+
+        target = plan_rebalance(current, shards)
+        moves = {}
+        for bucket, (source, destination) in enumerate(zip(current, target)):
+            if source != destination:
+                moves.setdefault((source, destination), set()).add(bucket)
+        counts = Counter(target)
+        self.stdout.write("Buckets per shard: " + ", ".join(f"{alias} {counts[alias]}" for alias in shards))
+        if not moves:
+            if frozen_buckets() and not options['dry_run']:
+                # Left over from an interrupted run that had nothing to move
+                write_shard_map(path, current)
+            self.stdout.write(self.style.SUCCESS("Shards are balanced, nothing to move"))
+            return
+
+        if options['dry_run']:
+            moved = 0
+            for (source, destination), buckets in moves.items():
+                pair = sum(len(ids) for ids in _user_batches(source, buckets, options['batch_size']))
+                self.stdout.write(f"  {source} -> {destination}: {len(buckets)} buckets, {pair} users")
+                moved += pair
+            self.stdout.write(self.style.SUCCESS(f"Dry run: {moved} users would move"))
+            return
+
+        # Freeze the moving buckets on their current shard (writes raise
+        # BucketFrozen) and wait until every worker has reloaded the map, so
+        # nothing changes on the source while it is copied
+        moving = set().union(*moves.values())
+        write_shard_map(path, current, frozen=moving)
+        self.stdout.write(f"Froze {len(moving)} buckets in {path}, waiting for workers to reload it")
+        self._wait_for_workers(options['settle_seconds'])
+
+        moved = 0
+        for (source, destination), buckets in moves.items():
+            # Rows of these buckets on the destination are leftovers of an interrupted run
+            self._delete_buckets(destination, buckets, options['batch_size'])
+            pair = 0
+            for ids in _user_batches(source, buckets, options['batch_size']):
+                _copy_users(ids, source, destination)
+                pair += len(ids)
+            self.stdout.write(f"  {source} -> {destination}: {len(buckets)} buckets, {pair} users")
+            moved += pair
+
+        # Switch and unfreeze; the old copies are removed once every worker
+        # reads and writes the new shards
+        write_shard_map(path, target)
+        self.stdout.write(f"Wrote {path}")
+        self._wait_for_workers(options['settle_seconds'])
+        self._cleanup(target, {source for source, _ in moves}, options['batch_size'], dry_run=False)
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} users"))
+
+    def _wait_for_workers(self, settle_seconds):
+        time.sleep(getattr(settings, 'AUTH_SHARD_MAP_CHECK_SECONDS', 5) + settle_seconds)
+        shard_map(refresh=True)
+
+    def _delete_buckets(self, alias, buckets, batch_size):
+        for ids in _user_batches(alias, buckets, batch_size):
+            # Cascades to profiles, token families and M2M rows
+            User.objects.using(alias).filter(pk__in=ids).delete()
+
+    def _cleanup(self, buckets, aliases, batch_size, dry_run):
+        for alias in sorted(aliases):
+            foreign = {bucket for bucket, owner in enumerate(buckets) if owner != alias}
+            removed = 0
+            for ids in _user_batches(alias, foreign, batch_size):
+                if not dry_run:
+                    # Cascades to profiles, token families and M2M rows
+                    User.objects.using(alias).filter(pk__in=ids).delete()
+                removed += len(ids)
+            verb = "would be removed" if dry_run else "removed"
+            self.stdout.write(f"  {alias}: {removed} users {verb}")
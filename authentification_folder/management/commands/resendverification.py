@@ -0,0 +1,139 @@
+import json
+import os
+import smtplib
+import time
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone as tz
+
+from authentification.sharding import frozen_buckets, sharding_enabled, user_databases
+from authentification.utils import build_verification_email, verification_tokens
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Re-send verification emails to unverified users (chunked, rate-limited, resumable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Users fetched (and tokens minted) per chunk")
+        parser.add_argument('--rate', type=float, default=10.0, help="Maximum messages per second")
+        parser.add_argument('--since', help="Only users who joined on or after this date (YYYY-MM-DD)")
+        parser.add_argument('--checkpoint', default='resendverification.checkpoint.json',
+        help="File recording progress; a re-run resumes after the last user sent")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the users that would be emailed")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        rate = options['rate']
+        if chunk_size < 1 or rate <= 0:
+            raise CommandError("--chunk-size and --rate must be positive")
+
+        if sharding_enabled() and frozen_buckets(refresh=True):
+            # A bucket being copied exists on two shards; its users would be emailed twice
+            raise CommandError("rebalanceusers is moving buckets, try again once it has finished")
+
+        users = User.objects.filter(email_verified=False)
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError("--since must be a date like 2025-01-31")
+            users = users.filter(date_joined__gte=tz.make_aware(since))
+
+        self.checkpoint_path = options['checkpoint']
+        # Databases are walked in user_databases() order; ``done`` lists the finished ones
+        databases = user_databases()
+        state = {'database': databases[0], 'last_pk': None, 'sent': 0, 'done': []}
+        if not options['restart'] and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            self.stdout.write(
+                f"Resuming after user {state['last_pk']} on {state['database']} ({state['sent']} already sent)"
+            )
+        pending = [alias for alias in databases if alias not in state['done']]
+
+        if options['dry_run']:
+            count = 0
+            for alias in pending:
+                remaining = users.using(alias)
+                if alias == state['database'] and state['last_pk'] is not None:
+                    remaining = remaining.filter(pk__gt=state['last_pk'])
+                count += remaining.count()
+            self.stdout.write(f"{count} users would be emailed")
+            return
+
+        self.interval = 1.0 / rate
+        self.connection = get_connection(fail_silently=False)
+        self.connection.open()
+        self.started = time.monotonic()
+        self.next_send = self.started
+        self.sent_now = 0
+        try:
+            for alias in pending:
+                if alias != state['database']:
+                    state.update(database=alias, last_pk=None)
+                self._send_all(users.using(alias), state, chunk_size)
+                state['done'].append(alias)
+                self._save_checkpoint(state)
+        except Exception as e:
+            self._save_checkpoint(state)
+            raise CommandError(f"Stopped after user {state['last_pk']} on {state['database']}: {e}. Re-run to resume.")
+        except KeyboardInterrupt:
+            self._save_checkpoint(state)
+            self.stdout.write(f"Interrupted after user {state['last_pk']} on {state['database']}; re-run to resume")
+            return
+        finally:
+            self.connection.close()
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {self.sent_now} verification emails ({state['sent']} in total) in {time.monotonic() - self.started:.1f}s"
+        ))
+
+    def _send_all(self, users, state, chunk_size):
+        """Email every user of ``users`` after state['last_pk'], checkpointing each chunk"""
+        while True:
+            # Keyset pagination: the primary key index, never an OFFSET scan
+            chunk = users.order_by('pk').only('pk', 'email')
+            if state['last_pk'] is not None:
+                chunk = chunk.filter(pk__gt=state['last_pk'])
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                return
+
+            tokens = verification_tokens(chunk)
+            for user in chunk:
+                delay = self.next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.next_send = max(self.next_send, time.monotonic()) + self.interval
+
+                message = build_verification_email(user, tokens[user.id], connection=self.connection)
+                try:
+                    message.send()
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # The server dropped the reused connection; reconnect once
+                    self.connection.close()
+                    self.connection.open()
+                    message.send()
+                state['last_pk'] = user.pk
+                state['sent'] += 1
+                self.sent_now += 1
+
+            self._save_checkpoint(state)
+            elapsed = time.monotonic() - self.started
+            self.stdout.write(
+                f"  {state['sent']} sent, last user {state['last_pk']} ({self.sent_now / max(elapsed, 1e-6):.1f} msg/s)"
+            )
+
+    def _save_checkpoint(self, state):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
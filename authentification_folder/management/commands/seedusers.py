@@ -0,0 +1,243 @@
+import io
+import json
+import random
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone as tz
+
+from authentification.digests import digest_frequency, next_digest_time
+from authentification.sharding import frozen_buckets, new_user_id, shard_for_email, sharding_enabled
+
+User = get_user_model()
+
+FIRST_NAMES = ['Ada', 'Alan', 'Grace', 'Linus', 'Margaret', 'Dennis', 'Barbara', 'Ken', 'Frances', 'Guido',
+               'Radia', 'Tim', 'Hedy', 'Edsger', 'Karen', 'Donald', 'Shafi', 'John', 'Sophie', 'Niklaus']
+LAST_NAMES = ['Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Hamilton', 'Ritchie', 'Liskov', 'Thompson', 'Allen',
+              'Rossum', 'Perlman', 'Berners-Lee', 'Lamarr', 'Dijkstra', 'Jones', 'Knuth', 'Goldwasser', 'Backus']
+TIME_ZONES = ['UTC', 'Europe/London', 'Europe/Paris', 'America/New_York', 'America/Los_Angeles', 'Asia/Tokyo',
+              'Asia/Kolkata', 'Africa/Lagos', 'Australia/Sydney', 'America/Sao_Paulo']
+JOB_TITLES = ['Engineer', 'Designer', 'Product Manager', 'Analyst', 'Support', 'Sales', 'Researcher', 'Writer']
+SOCIAL_SITES = [('GitHub', 'https://github.com/'), ('LinkedIn', 'https://linkedin.com/in/'),
+                ('Mastodon', 'https://mastodon.social/@'), ('Website', 'https://')]
+
+
+def _copy_value(value):
+    """Encode a value for PostgreSQL's COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif not isinstance(value, str):
+        value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users (with profiles and roles) for capacity testing; '
+        'with AUTH_SHARDS each user is written to the shard of its email'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help="Number of users to create")
+        parser.add_argument('--seed', type=int, default=0, help="Seed; the same seed gives the same rows")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Rows per COPY / executemany batch")
+        parser.add_argument('--password', default='password', help="Password of every generated user")
+        parser.add_argument('--password-hashes', type=int, default=8,
+        help="Distinct password hashes to precompute and reuse (hashing is the slow part)")
+        parser.add_argument('--domain', default='example.test', help="Email domain of the generated users")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        batch_size = options['batch_size']
+        if count < 1 or batch_size < 1:
+            raise CommandError("--count and --batch-size must be positive")
+
+        self.sharded = sharding_enabled()
+        if self.sharded and frozen_buckets(refresh=True):
+            raise CommandError("rebalanceusers is moving buckets, try again once it has finished")
+
+        self.rng = random.Random(options['seed'])
+        self.seed = options['seed']
+        self.domain = options['domain']
+        self.now = tz.now()
+        self.profile_model = self._related_model('profile')
+        self.role_ids = self._role_ids()
+
+        started = time.perf_counter()
+        self.password_hashes = [make_password(options['password']) for _ in range(max(1, options['password_hashes']))]
+        self.stdout.write(f"Precomputed {len(self.password_hashes)} password hashes in {time.perf_counter() - started:.1f}s")
+
+        user_fields = [field for field in User._meta.concrete_fields]
+        profile_fields = [field for field in self.profile_model._meta.concrete_fields] if self.profile_model else []
+
+        # Explicit ids let profiles reference their users without reading them back.
+        # Under sharding user ids come from new_user_id (they carry the bucket);
+        # profile ids are per database
+        next_user_id = None
+        if not self.sharded:
+            next_user_id = (User.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        next_profile_ids = {}
+        aliases = set()
+        loaders = set()
+
+        started = time.perf_counter()
+        rows = 0
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            batches = {}
+            for index in range(offset, offset + size):
+                user = self._user_row(index)
+                if self.sharded:
+                    user['id'] = new_user_id(user['email'])
+                    alias = shard_for_email(user['email'])
+                else:
+                    user['id'] = next_user_id + index
+                    alias = DEFAULT_DB_ALIAS
+                users, profiles = batches.setdefault(alias, ([], []))
+                users.append([user[field.attname] if field.attname in user else field.get_default() for field in user_fields])
+                if self.profile_model:
+                    if alias not in next_profile_ids:
+                        next_profile_ids[alias] = (
+                            self.profile_model.objects.using(alias).order_by('-pk').values_list('pk', flat=True).first() or 0
+                        ) + 1
+                    profile = self._profile_row(next_profile_ids[alias], user['id'])
+                    next_profile_ids[alias] += 1
+                    # Scheduled like the profile pre_save signal does, so seeded users get digests
+                    values = SimpleNamespace(**{field.attname: profile[field.attname] for field in profile_fields if field.attname in profile})
+                    profile['next_digest_at'] = next_digest_time(user['time_zone'], digest_frequency(values), self.now)
+                    profiles.append([profile[field.attname] if field.attname in profile else field.get_default() for field in profile_fields])
+
+            for alias, (users, profiles) in batches.items():
+                aliases.add(alias)
+                connection = connections[alias]
+                load = self._copy if connection.vendor == 'postgresql' else self._executemany
+                loaders.add('COPY' if load == self._copy else 'executemany')
+                with transaction.atomic(using=alias):
+                    load(connection, User, user_fields, users)
+                    if self.profile_model:
+                        load(connection, self.profile_model, profile_fields, profiles)
+                rows += len(users) + len(profiles)
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {offset + size}/{count} users ({rows / elapsed:,.0f} rows/s)")
+
+        # The ids were assigned here, so move the sequences past them
+        models = [User] + ([self.profile_model] if self.profile_model else [])
+        for alias in sorted(aliases):
+            connection = connections[alias]
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(sql)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {count} users and {rows - count} profiles: {rows} rows in {elapsed:.1f}s "
+            f"({rows / elapsed:,.0f} rows/s, loaded with {' and '.join(sorted(loaders))})"
+        ))
+
+    def _related_model(self, name):
+        try:
+            return User._meta.get_field(name).related_model
+        except FieldDoesNotExist:
+            return None
+
+    def _role_ids(self):
+        role_model = self._related_model('role')
+        if role_model is None:
+            return []
+        if not role_model.objects.exists():
+            choices = role_model._meta.get_field('name').choices or []
+            role_model.objects.bulk_create([role_model(name=value) for value, label in choices])
+        roles = list(role_model.objects.order_by('pk'))
+        if self.sharded:
+            # Users reference roles by id, so every shard needs the default database's roles
+            for alias in set(getattr(settings, 'AUTH_SHARDS', [])) - {DEFAULT_DB_ALIAS}:
+                role_model.objects.using(alias).bulk_create(roles, ignore_conflicts=True)
+        return [role.pk for role in roles]
+
+    def _user_row(self, index):
+        rng = self.rng
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        verified = rng.random() < 0.9
+        joined = self.now - timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600))
+        return {
+            'email': f"{first_name}.{last_name}.{self.seed}.{index}@{self.domain}".lower(),
+            'password': self.password_hashes[index % len(self.password_hashes)],
+            'first_name': first_name,
+            'last_name': last_name,
+            'role_id': rng.choice(self.role_ids) if self.role_ids else None,
+            'avatar': None,
+            'bio': f"{first_name} works on {rng.choice(JOB_TITLES).lower()} things." if rng.random() < 0.5 else '',
+            'is_active': verified,
+            'is_staff': False,
+            'is_superuser': False,
+            'is_deleted': rng.random() < 0.02,
+            'email_verified': verified,
+            'time_zone': rng.choice(TIME_ZONES),
+            'preferences': {
+                'theme': rng.choice(['dark', 'light', 'system']),
+                'notifications': {'email': rng.random() < 0.8, 'push': rng.random() < 0.3},
+                'language': rng.choice(['en', 'fr', 'de', 'es', 'ja']),
+            },
+            'date_joined': joined,
+            'last_login': joined + timedelta(seconds=rng.randrange(30 * 24 * 3600)) if verified else None,
+        }
+
+    def _profile_row(self, profile_id, user_id):
+        rng = self.rng
+        handle = f"user{user_id}"
+        return {
+            'id': profile_id,
+            'user_id': user_id,
+            'job_title': rng.choice(JOB_TITLES),
+            'phone_number': f"+1555{rng.randrange(10 ** 7):07d}" if rng.random() < 0.6 else None,
+            'social_links': [
+                {'name': name, 'url': f"{prefix}{handle}"} for name, prefix in rng.sample(SOCIAL_SITES, rng.randrange(3))
+            ],
+            'communication_preferences': {
+                'allow_team_mentions': rng.random() < 0.7,
+                'digest_frequency': rng.choice(['daily', 'weekly', 'never']),
+            },
+            'security_settings': {'2fa_enabled': rng.random() < 0.3, 'login_alerts': rng.random() < 0.6},
+        }
+
+    def _copy(self, connection, model, fields, rows):
+        sql = 'COPY {} ({}) FROM STDIN'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        )
+        data = ''.join('\t'.join(_copy_value(value) for value in row) + '\n' for row in rows)
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy'):
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(data)
+            else:
+                raw.copy_expert(sql, io.StringIO(data))
+
+    def _executemany(self, connection, model, fields, rows):
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields))
+        )
+        params = [
+            [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+            for row in rows
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
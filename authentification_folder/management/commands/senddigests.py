@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentification.digests import reschedule_all, send_due_digests
+from authentification.sharding import frozen_buckets, sharding_enabled, user_databases
+
+
+class Command(BaseCommand):
+    help = 'Send the digest emails that are due (run it from cron, or with --interval as a worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Digests sent per SMTP connection")
+        parser.add_argument('--interval', type=float, help="Keep running, checking for due digests every N seconds")
+        parser.add_argument('--reschedule', action='store_true',
+        help="Recompute every profile's next send time first (after changing DIGEST_* settings or importing users)")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the digests that are due")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        if options['reschedule']:
+            if self._rebalancing():
+                raise CommandError("rebalanceusers is moving buckets, try again once it has finished")
+            rescheduled = sum(reschedule_all(using=alias) for alias in user_databases())
+            self.stdout.write(f"Rescheduled {rescheduled} profiles")
+
+        while True:
+            started = time.perf_counter()
+            if self._rebalancing():
+                # bulk_update bypasses the frozen-bucket check; skip this round
+                if not options['interval']:
+                    raise CommandError("rebalanceusers is moving buckets, try again once it has finished")
+                self.stdout.write("rebalanceusers is moving buckets, skipping this round")
+                time.sleep(options['interval'])
+                continue
+            totals = {'sent': 0, 'skipped': 0, 'failed': 0}
+            for alias in user_databases():
+                if sharding_enabled():
+                    self.stdout.write(f"Shard {alias}:")
+                sent = send_due_digests(
+                    batch_size=options['batch_size'], dry_run=options['dry_run'], log=self.stdout.write, using=alias
+                )
+                for key in totals:
+                    totals[key] += sent[key]
+            if not options['dry_run']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sent {totals['sent']} digests ({totals['skipped']} skipped, {totals['failed']} failed) "
+                    f"in {time.perf_counter() - started:.1f}s"
+                ))
+            if not options['interval'] or options['dry_run']:
+                return
+            time.sleep(options['interval'])
+
+    def _rebalancing(self):
+        return sharding_enabled() and bool(frozen_buckets(refresh=True))
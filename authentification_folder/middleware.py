@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+
+from .routers import begin_request, end_request, request_wrote
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Pin a client's reads to the primary for a short window after it wrote.
+
+    The window end is sent back both as a cookie and as an ``X-Primary-Until``
+    header; clients that do not keep cookies can echo the header instead.
+    """
+    cookie_name = 'auth_primary_until'
+    header_name = 'X-Primary-Until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.window = getattr(settings, 'AUTH_PRIMARY_PIN_SECONDS', 5)
+
+    def _pinned(self, request):
+        value = request.COOKIES.get(self.cookie_name) or request.headers.get(self.header_name)
+        try:
+            until = float(value)
+        except (TypeError, ValueError):
+            return False
+        now = time.time()
+        # Ignore values a client could use to pin itself forever
+        return now < until <= now + self.window
+
+    def __call__(self, request):
+        tokens = begin_request(pinned=self._pinned(request))
+        try:
+            response = self.get_response(request)
+            if request_wrote():
+                until = f'{time.time() + self.window:.3f}'
+                response.set_cookie(
+                    self.cookie_name,
+                    until,
+                    max_age=self.window,
+                    httponly=True,
+                    samesite='Lax'
+                )
+                response[self.header_name] = until
+        finally:
+            end_request(tokens)
+        return response
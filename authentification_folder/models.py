@@ -35,6 +35,23 @@ class UserManager(BaseUserManager):
         
         return self.create_user(email, password, **extra_fields)
 
+class AuthUserManager(UserManager):
+    """
+    Users as loaded on the authentication hot path (login, JWT, email tokens)
+
+    Only the columns authentication and the login response need are
+    selected; bio, avatar, preferences and the rest are deferred and load on
+    first access.
+    """
+    auth_fields = (
+        'email', 'password', 'first_name', 'last_name', 'role', 'is_active',
+        'is_staff', 'is_superuser', 'is_deleted', 'email_verified', 'last_login',
+    )
+
+    def get_queryset(self):
+        names = {field.name for field in self.model._meta.concrete_fields}
+        return super().get_queryset().only(*(name for name in self.auth_fields if name in names))
+
 class Role(models.TextChoices):
     OWNER = 'Owner', 'Owner'
     ADMIN = 'Admin', 'Admin'
@@ -86,9 +103,17 @@ class User(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(default=tz.now)
 
     objects = UserManager()
+    auth_objects = AuthUserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
+
+    class Meta:
+        indexes = [
+            # Drives purge_unverified_users (purgeunverified command)
+            models.Index(fields=['email_verified', 'date_joined'], name='user_unverified_joined_idx'),
+        ]
+
     @property
     def fullname(self):
         """Dynamic property for full name"""
@@ -141,4 +166,28 @@ class UserProfile(models.Model):
         default=dict,
         verbose_name=("Security Settings"),
         help_text=("e.g., {'2fa_enabled': true, 'login_alerts': true}")
-    )
\ No newline at end of file
+    )
+
+    # Maintained by the digest signals; drives the senddigests command
+    next_digest_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+class TokenFamily(models.Model):
+    family = models.CharField(max_length=32, primary_key=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="token_families"
+    )
+    current_jti = models.CharField(max_length=255)
+    revoked = models.BooleanField(default=False)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.user_id}:{self.family}"
+
+class UsedToken(models.Model):
+    jti = models.CharField(max_length=64, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
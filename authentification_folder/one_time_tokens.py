@@ -0,0 +1,125 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+
+from .models import UsedToken
+
+# Cache backends that are not shared between processes
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class ExpiringIndex:
+    """
+    In-process set of consumed jtis that forgets entries once their token expired.
+
+    A replayed token that this process has already seen is rejected without
+    a round trip; the heap keeps eviction O(log n).
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._expiry = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._heap and (self._heap[0][0] <= now or len(self._expiry) > self.max_entries):
+            expires_at, jti = heapq.heappop(self._heap)
+            if self._expiry.get(jti) == expires_at:
+                del self._expiry[jti]
+
+    def __contains__(self, jti):
+        with self._lock:
+            expires_at = self._expiry.get(jti)
+            return expires_at is not None and expires_at > time.time()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expiry[jti] = expires_at
+            heapq.heappush(self._heap, (expires_at, jti))
+            self._evict(time.time())
+
+
+class OneTimeTokenStore:
+    """
+    Remembers which emailed tokens (by ``jti``) have been used.
+
+    The shared backend is the cache when it is shared between processes
+    (e.g. Redis, whose keys expire natively), otherwise the UsedToken table.
+    Either way consuming a token is one atomic round trip: ``cache.add`` or
+    a primary key insert.
+    """
+    key_prefix = 'ott'
+
+    def __init__(self, cache_alias='default', backend=None, max_local_entries=100000):
+        self.cache = caches[cache_alias]
+        if backend is None:
+            backend_path = settings.CACHES.get(cache_alias, {}).get('BACKEND', LOCAL_CACHE_BACKENDS[0])
+            backend = 'database' if backend_path in LOCAL_CACHE_BACKENDS else 'cache'
+        if backend not in ('cache', 'database'):
+            raise ValueError(f"Unknown one-time token backend: {backend}")
+        self.backend = backend
+        self.local = ExpiringIndex(max_local_entries)
+
+    def consume(self, jti, expires_at):
+        """
+        Mark ``jti`` as used.
+
+        Args:
+            jti (str): Token id
+            expires_at (float): Token expiry as a UNIX timestamp
+
+        Returns:
+            bool: True the first time, False if the token was already used
+        """
+        if jti in self.local:
+            return False
+        ttl = max(1, int(expires_at - time.time()))
+        if self.backend == 'cache':
+            fresh = self.cache.add(f'{self.key_prefix}:{jti}', 1, ttl)
+        else:
+            try:
+                with transaction.atomic():
+                    UsedToken.objects.create(
+                        jti=jti,
+                        expires_at=datetime.fromtimestamp(expires_at, tz=timezone.utc)
+                    )
+                fresh = True
+            except IntegrityError:
+                fresh = False
+        self.local.add(jti, expires_at)
+        return fresh
+
+
+_store = None
+
+
+def get_one_time_token_store():
+    global _store
+    if _store is None:
+        _store = OneTimeTokenStore(
+            cache_alias=getattr(settings, 'ONE_TIME_TOKEN_CACHE_ALIAS', 'default'),
+            backend=getattr(settings, 'ONE_TIME_TOKEN_BACKEND', None),
+        )
+    return _store
+
+
+def consume_token(payload):
+    """
+    Consume a decoded email token; False if it was used before.
+
+    Tokens minted before jtis were added carry none and are accepted until
+    they expire.
+    """
+    jti = payload.get('jti')
+    if not jti:
+        return True
+    return get_one_time_token_store().consume(jti, payload['exp'])
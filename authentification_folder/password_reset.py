@@ -0,0 +1,69 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .models import User
+from .sharding import shard_for_email
+from .utils import send_password_reset_email
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PASSWORD_RESET_WORKERS', 2),
+                thread_name_prefix='password-reset'
+            )
+    return _executor
+
+
+def _cache():
+    return caches[getattr(settings, 'PASSWORD_RESET_CACHE_ALIAS', 'default')]
+
+
+def _key(email):
+    digest = hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()
+    return f'pwreset:{digest}'
+
+
+def _send(email, key):
+    try:
+        user = User.auth_objects.using(shard_for_email(email)).filter(email=User.objects.normalize_email(email)).first()
+        if user is not None:
+            send_password_reset_email(user)
+    except Exception as e:
+        # Let the next request try again instead of waiting out the window
+        _cache().delete(key)
+        print(f"Error sending password reset email: {e}")
+    finally:
+        connections.close_all()
+
+
+def request_password_reset(email):
+    """
+    Queue a password reset email, at most once per email per window.
+
+    The first request in PASSWORD_RESET_COALESCE_SECONDS claims a cache key
+    and hands the user lookup and the send to a background thread; repeated
+    requests find the key taken and do nothing, so the outstanding emailed
+    token stays the one to use. The caller's work (one cache add) is the
+    same whether or not the account exists, and nothing is written to the
+    database.
+
+    Returns:
+        bool: True if an email was queued, False if the request was coalesced
+    """
+    key = _key(email)
+    window = getattr(settings, 'PASSWORD_RESET_COALESCE_SECONDS', 300)
+    if not _cache().add(key, 1, window):
+        return False
+    _get_executor().submit(_send, email, key)
+    return True
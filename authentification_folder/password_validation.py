@@ -0,0 +1,65 @@
+import hashlib
+
+from django.contrib.auth.password_validation import get_default_password_validators, validate_password
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.utils.translation import gettext as _
+
+from .hash_files import BREACHED_PASSWORDS_MAGIC, open_hash_file
+
+# Bytes of each SHA-1 kept in the lookup file (80 bits)
+DEFAULT_WIDTH = 10
+
+
+class BreachedPasswordValidator:
+    """
+    Reject passwords that appear in a local copy of a breach corpus
+    (e.g. the Have I Been Pwned SHA-1 dump), without any network call.
+
+    OPTIONS:
+        path: file written by ``manage.py buildbreachedpasswords``
+        required: when False (default) a missing file disables the check
+    """
+
+    def __init__(self, path='breached-passwords.bin', required=False):
+        self.path = path
+        self.required = required
+        self._missing_reported = False
+
+    def _hashes(self):
+        try:
+            return open_hash_file(self.path, BREACHED_PASSWORDS_MAGIC)
+        except FileNotFoundError:
+            if self.required:
+                raise ImproperlyConfigured(f"Breached password file not found: {self.path}")
+            if not self._missing_reported:
+                print(f"Warning: breached password file {self.path} not found, skipping the check")
+                self._missing_reported = True
+            return None
+
+    def validate(self, password, user=None):
+        hashes = self._hashes()
+        if hashes is None:
+            return
+        if hashlib.sha1(password.encode('utf-8')).digest() in hashes:
+            raise ValidationError(
+                _("This password has appeared in a data breach and cannot be used."),
+                code='password_breached',
+            )
+
+    def get_help_text(self):
+        return _("Your password can't be one that has appeared in a known data breach.")
+
+
+def validate_not_breached(password, user=None):
+    """
+    Run only the BreachedPasswordValidator entries of AUTH_PASSWORD_VALIDATORS
+
+    Registration and password reset apply the breach check without taking
+    on the rest of the configured policy (length, similarity, common
+    passwords). Raises ValidationError.
+    """
+    validators = [
+        validator for validator in get_default_password_validators()
+        if isinstance(validator, BreachedPasswordValidator)
+    ]
+    validate_password(password, user, password_validators=validators)
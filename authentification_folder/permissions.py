@@ -0,0 +1,29 @@
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class HasServiceAPIKey(BasePermission):
+    """
+    Allow internal services presenting one of SERVICE_API_KEYS, either as an
+    ``X-Api-Key`` header or as ``Authorization: Api-Key <key>``.
+    """
+    message = "A valid service API key is required."
+
+    def _presented_key(self, request):
+        key = request.headers.get('X-Api-Key')
+        if key:
+            return key
+        kind, _, value = request.headers.get('Authorization', '').partition(' ')
+        return value if kind == 'Api-Key' else None
+
+    def has_permission(self, request, view):
+        key = self._presented_key(request)
+        if not key:
+            return False
+        # Compare against every key so the time taken does not reveal which one matched
+        matched = False
+        for candidate in getattr(settings, 'SERVICE_API_KEYS', []):
+            matched |= hmac.compare_digest(key.encode('utf-8'), candidate.encode('utf-8'))
+        return matched
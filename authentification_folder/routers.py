@@ -0,0 +1,120 @@
+import random
+import threading
+from collections import Counter
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Label of the app this module was copied into (e.g. "accounts.routers" -> "accounts")
+APP_LABEL = __name__.rpartition('.')[0].rpartition('.')[2]
+
+_pinned = ContextVar('auth_primary_pinned', default=False)
+_wrote = ContextVar('auth_primary_wrote', default=False)
+
+# Check-then-write security state (refresh token families, used one-time
+# tokens): a lagging replica would let a used token pass, so always primary
+PRIMARY_MODELS = {'tokenfamily', 'usedtoken'}
+
+_metrics_lock = threading.Lock()
+_routed = Counter()
+
+
+def begin_request(pinned=False):
+    """Reset the stickiness state for a new request and return tokens to restore it."""
+    return _pinned.set(pinned), _wrote.set(False)
+
+
+def end_request(tokens):
+    pinned_token, wrote_token = tokens
+    _pinned.reset(pinned_token)
+    _wrote.reset(wrote_token)
+
+
+def request_wrote():
+    return _wrote.get()
+
+
+def _metrics_enabled():
+    return getattr(settings, 'AUTH_ROUTER_METRICS', settings.DEBUG)
+
+
+def _count(alias, kind):
+    with _metrics_lock:
+        _routed[(alias, kind)] += 1
+
+
+def _routed_model(model):
+    # Only models of the app registry; the monthly audit models (own registry)
+    # are written and read on AUDIT_LOG_DATABASE
+    return model._meta.app_label == APP_LABEL and model._meta.apps is apps
+
+
+def replica_metrics():
+    """
+    Per-alias counts of routed queries and the share of reads served by replicas.
+
+    Only counted with AUTH_ROUTER_METRICS (default: DEBUG), which puts a
+    lock on every routed query.
+    """
+    with _metrics_lock:
+        routed = dict(_routed)
+    replicas = set(getattr(settings, 'AUTH_READ_REPLICAS', []))
+    reads = {alias: n for (alias, kind), n in routed.items() if kind == 'read'}
+    writes = {alias: n for (alias, kind), n in routed.items() if kind == 'write'}
+    total_reads = sum(reads.values())
+    replica_reads = sum(n for alias, n in reads.items() if alias in replicas)
+    return {
+        'enabled': _metrics_enabled(),
+        'reads': reads,
+        'writes': writes,
+        'offload_ratio': replica_reads / total_reads if total_reads else 0.0,
+    }
+
+
+class ReplicaRouter:
+    """
+    Send reads of the auth app's models to AUTH_READ_REPLICAS (the audit
+    log's monthly models are left alone, PRIMARY_MODELS are always read
+    from the primary).
+
+    Reads stay on the primary while the request is pinned (the client wrote
+    recently, see PrimaryStickinessMiddleware) or once the current request has
+    written anything itself.
+    """
+
+    def _replicas(self):
+        return getattr(settings, 'AUTH_READ_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        if not _routed_model(model):
+            return None
+        replicas = self._replicas()
+        if not replicas or _pinned.get() or _wrote.get() or model._meta.model_name in PRIMARY_MODELS:
+            alias = DEFAULT_DB_ALIAS
+        else:
+            alias = random.choice(replicas)
+        if _metrics_enabled():
+            _count(alias, 'read')
+        return alias
+
+    def db_for_write(self, model, **hints):
+        if not _routed_model(model):
+            return None
+        _wrote.set(True)
+        if _metrics_enabled():
+            _count(DEFAULT_DB_ALIAS, 'write')
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *self._replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive their schema through replication
+        if db in self._replicas():
+            return False
+        return None
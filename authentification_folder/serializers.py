@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from .models import User
+from django.conf import settings
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .audit import LOGIN, LOGIN_FAILED, audit
+from .email_domains import validate_email_domain
+from .password_validation import validate_not_breached
+from .sharding import shard_for_email
+from .token_families import FAMILY_CLAIM, get_token_family_store, issue_refresh_token
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True,required=True,style={'input_type': 'password'},)    
@@ -11,8 +20,25 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ['email','first_name','last_name', 'password', 'role']
         extra_kwargs={
             'first_name': {'required': True},
-            'last_name': {'required': True}
+            'last_name': {'required': True},
+            # Uniqueness is checked in validate_email, on the user's shard
+            'email': {'validators': []}
         }
+
+    def validate_email(self, value):
+        value = validate_email_domain(value)
+        if User.objects.using(shard_for_email(value)).filter(email=value).exists():
+            raise serializers.ValidationError("A user with this email already exists.")
+        return value
+
+    def validate(self, attrs):
+        # Only the breached password check; the rest of AUTH_PASSWORD_VALIDATORS is not applied at signup
+        try:
+            validate_not_breached(attrs['password'])
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'password': list(e.messages)})
+        return attrs
+
     def create(self, validated_data):
         user = User.objects.create_user(
             email=validated_data['email'],
@@ -49,17 +75,22 @@ class LoginSerializer(serializers.Serializer):
                 username=email,
                 password=password
             )
+            request = self.context.get('request')
             if not user:
+                audit(LOGIN_FAILED, request, email=email, reason='invalid_credentials')
                 raise serializers.ValidationError({"custom_error": "Invalid credentials."})
             if not user.is_active:
+                audit(LOGIN_FAILED, request, user, reason='inactive')
                 raise serializers.ValidationError("User account is inactive.")
             if not user.email_verified:
+                audit(LOGIN_FAILED, request, user, reason='email_not_verified')
                 raise serializers.ValidationError("Email is not verified.")
             
         
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_refresh_token(user)
+        audit(LOGIN, request, user)
         return {
-                'user_id': user.id,
+                'user_id': str(user.id),
                 'email': user.email,
                 'first_name': user.first_name,
                 'last_name': user.last_name,
@@ -67,10 +98,34 @@ class LoginSerializer(serializers.Serializer):
                 'access': str(refresh.access_token),
             }
         
-class PasswordResetRequestSerializer(serializers.ModelSerializer):
-    email = serializers.EmailField()
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        family = refresh.get(FAMILY_CLAIM)
+        if not family:
+            raise InvalidToken("Token has no token family.")
+
+        old_jti = refresh[api_settings.JTI_CLAIM]
+        refresh.set_jti()
+        refresh.set_exp()
+        refresh.set_iat()
+
+        store = get_token_family_store()
+        if not store.rotate(family, old_jti, refresh[api_settings.JTI_CLAIM]):
+            # An already rotated token was presented: treat the whole family as stolen.
+            store.revoke(family)
+            raise InvalidToken("Refresh token reuse detected, session revoked.")
+
+        return {
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+        }
+
+
+class PasswordResetRequestSerializer(serializers.Serializer):
+    email = serializers.EmailField(validators=[validate_email_domain])
     
-class PasswordResetConfirmSerializer(serializers.ModelSerializer):
+class PasswordResetConfirmSerializer(serializers.Serializer):
     token = serializers.CharField(
         write_only=True,
         style={'input_type': 'text'},
@@ -81,4 +136,21 @@ class PasswordResetConfirmSerializer(serializers.ModelSerializer):
         style={'input_type': 'password'},
         min_length=8
     )
+
+    def validate_new_password(self, value):
+        try:
+            validate_not_breached(value)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(list(e.messages))
+        return value
     
+
+
+class TokenIntrospectionSerializer(serializers.Serializer):
+    tokens = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+
+    def validate_tokens(self, value):
+        limit = getattr(settings, 'INTROSPECTION_MAX_TOKENS', 100)
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} tokens per request.")
+        return value
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+
+# Label of the app this module was copied into (e.g. "accounts.sharding" -> "accounts")
+APP_LABEL = __name__.rpartition('.')[0].rpartition('.')[2]
+
+# Users are hashed into a fixed number of buckets; the shard map assigns
+# buckets to database aliases, so adding a shard moves whole buckets.
+BUCKETS = 1024
+BUCKET_BITS = 10
+SEQUENCE_BITS = 12
+ID_EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+
+# Models stored on the shard of their user (plus User's auto-created M2M tables)
+SHARDED_MODELS = {'user', 'userprofile', 'tokenfamily'}
+
+_map = None
+_map_lock = threading.Lock()
+_id_lock = threading.Lock()
+_last_ms = 0
+_sequence = 0
+
+
+class BucketFrozen(DatabaseError):
+    """Write refused: the user's bucket is being moved to another shard"""
+
+
+def sharding_enabled():
+    return bool(getattr(settings, 'AUTH_SHARDS', []))
+
+
+def email_bucket(email):
+    """Stable bucket of an email (case-insensitive, surrounding spaces ignored)"""
+    digest = hashlib.sha256(email.strip().lower().encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % BUCKETS
+
+
+def id_bucket(user_id):
+    """Bucket encoded in a user id created by new_user_id"""
+    return (int(user_id) >> SEQUENCE_BITS) & (BUCKETS - 1)
+
+
+def family_bucket(family):
+    """Bucket encoded in a token family created by new_family"""
+    return int(family[:3], 16) & (BUCKETS - 1)
+
+
+def new_user_id(email):
+    """
+    Time-ordered 63-bit user id carrying the bucket of ``email``
+
+    Layout: milliseconds since ID_EPOCH_MS, then BUCKET_BITS of bucket, then
+    SEQUENCE_BITS of per-process sequence (starting at a random value each
+    millisecond, so concurrent workers do not collide in practice).
+
+    Ids exceed 2**53 (the largest exact integer in JavaScript), so the API
+    and the JWT ``user_id`` claim carry user ids as strings.
+    """
+    global _last_ms, _sequence
+    with _id_lock:
+        now = int(time.time() * 1000) - ID_EPOCH_MS
+        if now > _last_ms:
+            _last_ms = now
+            _sequence = random.getrandbits(SEQUENCE_BITS)
+        else:
+            _sequence = (_sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+            if _sequence == 0:
+                # Sequence exhausted for this millisecond
+                _last_ms += 1
+        return (_last_ms << (BUCKET_BITS + SEQUENCE_BITS)) | (email_bucket(email) << SEQUENCE_BITS) | _sequence
+
+
+def new_family(user_id):
+    """Token family id; under sharding it starts with the user's bucket (3 hex digits)"""
+    family = uuid4().hex
+    if sharding_enabled():
+        family = f'{id_bucket(user_id):03x}{family[3:]}'
+    return family
+
+
+def default_shard_map(shards):
+    return [shards[bucket % len(shards)] for bucket in range(BUCKETS)]
+
+
+def load_shard_map(path):
+    """
+    Read a shard map file: ``{"buckets": [alias of bucket 0, ...], "frozen": [bucket, ...]}``
+
+    Returns (buckets, frozen buckets). ``frozen`` is optional.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    buckets = data['buckets']
+    if len(buckets) != BUCKETS:
+        raise ImproperlyConfigured(f"{path}: expected {BUCKETS} buckets, found {len(buckets)}")
+    unknown = set(buckets) - set(settings.DATABASES)
+    if unknown:
+        raise ImproperlyConfigured(f"{path}: unknown database aliases {sorted(unknown)}")
+    frozen = frozenset(data.get('frozen', ()))
+    if any(not isinstance(bucket, int) or not 0 <= bucket < BUCKETS for bucket in frozen):
+        raise ImproperlyConfigured(f"{path}: frozen buckets must be integers below {BUCKETS}")
+    return buckets, frozen
+
+
+def write_shard_map(path, buckets, frozen=()):
+    """Replace the shard map file atomically"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'buckets': list(buckets), 'frozen': sorted(frozen)}, f)
+    os.replace(tmp_path, path)
+
+
+def _load_map(refresh=False):
+    global _map
+    entry = _map
+    now = time.monotonic()
+    interval = getattr(settings, 'AUTH_SHARD_MAP_CHECK_SECONDS', 5)
+    if entry is not None and not refresh and now - entry[3] < interval:
+        return entry
+    with _map_lock:
+        shards = tuple(getattr(settings, 'AUTH_SHARDS', []))
+        path = getattr(settings, 'AUTH_SHARD_MAP_FILE', None)
+        try:
+            stat = os.stat(path)
+            identity = (shards, stat.st_ino, stat.st_mtime_ns)
+        except (TypeError, OSError):
+            identity = (shards, None, None)
+        if entry is not None and entry[2] == identity:
+            buckets, frozen = entry[:2]
+        elif identity[1] is None:
+            buckets, frozen = default_shard_map(shards), frozenset()
+        else:
+            buckets, frozen = load_shard_map(path)
+        _map = (buckets, frozen, identity, now)
+        return _map
+
+
+def shard_map(refresh=False):
+    """
+    Alias of every bucket
+
+    Read from AUTH_SHARD_MAP_FILE when it exists, else buckets are spread
+    round-robin over AUTH_SHARDS. The file is checked for changes at most
+    every AUTH_SHARD_MAP_CHECK_SECONDS, so a rebalance reaches every worker
+    without a restart.
+    """
+    return _load_map(refresh)[0]
+
+
+def frozen_buckets(refresh=False):
+    """Buckets being moved by rebalanceusers; their users are read-only meanwhile"""
+    return _load_map(refresh)[1]
+
+
+def user_databases(refresh=False):
+    """
+    Every alias holding users: AUTH_SHARDS plus any alias the shard map
+    still points at, or just the default database while sharding is off
+
+    Jobs that scan users (purges, digests, bulk emails) run once per alias
+    with ``.using(alias)``; an unhinted query would only see the default.
+    """
+    if not sharding_enabled():
+        return [DEFAULT_DB_ALIAS]
+    shards = list(settings.AUTH_SHARDS)
+    return shards + sorted(set(shard_map(refresh)) - set(shards))
+
+
+def check_writable(bucket, using):
+    """
+    Raise BucketFrozen when ``bucket`` is frozen and ``using`` is the shard
+    it is being copied from
+
+    Writes to the target shard (the copy itself, leftovers of an
+    interrupted run) are not live data yet and are allowed.
+    """
+    if bucket is None or not sharding_enabled():
+        return
+    buckets, frozen = _load_map()[:2]
+    if bucket in frozen and buckets[bucket] == using:
+        raise BucketFrozen(f"Bucket {bucket} is being moved to another shard, try again shortly")
+
+
+def instance_bucket(instance):
+    """Bucket of a sharded row (user, profile, token family or user M2M link), or None"""
+    opts = instance._meta
+    if not is_sharded(type(instance)):
+        return None
+    if opts.model_name == 'user':
+        if instance.pk is not None:
+            return id_bucket(instance.pk)
+        return email_bucket(instance.email) if instance.email else None
+    user_id = getattr(instance, 'user_id', None)
+    return id_bucket(user_id) if user_id is not None else None
+
+
+def plan_rebalance(current, shards):
+    """
+    New shard map spreading the buckets evenly over ``shards``
+
+    Buckets stay where they are while their shard is within its share;
+    only the surplus (and the buckets of removed shards) move.
+    """
+    quota = {alias: BUCKETS // len(shards) + (1 if i < BUCKETS % len(shards) else 0) for i, alias in enumerate(shards)}
+    target = list(current)
+    counts = Counter()
+    spare = []
+    for bucket, alias in enumerate(current):
+        if counts[alias] < quota.get(alias, 0):
+            counts[alias] += 1
+        else:
+            spare.append(bucket)
+    for alias in shards:
+        while counts[alias] < quota[alias]:
+            target[spare.pop()] = alias
+            counts[alias] += 1
+    return target
+
+
+def shard_for_email(email):
+    """Alias holding the user with ``email``, or None when sharding is off"""
+    if not sharding_enabled() or not email:
+        return None
+    return shard_map()[email_bucket(email)]
+
+
+def shard_for_user(user_id):
+    """Alias holding the user with ``user_id``, or None when sharding is off"""
+    if not sharding_enabled() or user_id is None:
+        return None
+    try:
+        return shard_map()[id_bucket(user_id)]
+    except (TypeError, ValueError):
+        return None
+
+
+def shard_for_family(family):
+    """Alias holding a token family, or None when sharding is off"""
+    if not sharding_enabled() or not family:
+        return None
+    try:
+        return shard_map()[family_bucket(family)]
+    except ValueError:
+        return None
+
+
+def is_sharded(model):
+    opts = model._meta
+    if opts.app_label != APP_LABEL:
+        return False
+    if opts.auto_created:
+        return opts.auto_created._meta.model_name == 'user'
+    return opts.model_name in SHARDED_MODELS
+
+
+def _instance_shard(instance):
+    opts = instance._meta
+    if opts.app_label != APP_LABEL:
+        return None
+    if opts.model_name == 'user':
+        return shard_for_user(instance.pk) if instance.pk else shard_for_email(instance.email)
+    return shard_for_user(getattr(instance, 'user_id', None))
+
+
+class ShardRouter:
+    """
+    Place users and their rows on one of AUTH_SHARDS.
+
+    A user lives on the shard of its bucket: the hash of the email when it
+    is created, then the bucket encoded in its id (new_user_id). Profiles,
+    token families and group/permission links follow their user. Queries
+    routed by an instance (saves, related lookups) land on the right shard;
+    lookups by email or id use shard_for_email / shard_for_user with
+    ``.using()``. Unhinted queries on sharded models go to the next router
+    (i.e. the default alias). Does nothing while AUTH_SHARDS is empty.
+    """
+
+    def _route(self, model, hints):
+        if not sharding_enabled() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        return _instance_shard(instance) or instance._state.db
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = is_sharded(type(obj1)), is_sharded(type(obj2))
+        if not sharding_enabled() or not any(sharded):
+            return None
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        # Reference rows (roles, groups) exist on every shard
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every shard gets the full schema (`migrate --database=<alias>` for each)
+        return None
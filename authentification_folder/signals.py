@@ -1,13 +1,91 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_init, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from authentification.models import User, UserProfile
+from authentification.digests import schedule_profile
+from authentification.models import TokenFamily, User, UserProfile
+from authentification.sharding import (
+    check_writable, email_bucket, frozen_buckets, id_bucket, instance_bucket, new_user_id, sharding_enabled,
+)
+
+@receiver(pre_save, sender=User)
+def assign_sharded_id(sender, instance, **kwargs):
+    # Under sharding the id carries the email's bucket, so lookups by id and
+    # by email agree on the shard
+    if not sharding_enabled():
+        return
+    if instance.pk is None:
+        instance.pk = new_user_id(instance.email)
+    elif 'email' in instance.__dict__ and email_bucket(instance.email) != id_bucket(instance.pk):
+        raise ValueError(f"User {instance.pk}: the new email belongs to another shard bucket")
+
+
+# While rebalanceusers moves a bucket, its rows on the source shard are
+# read-only, so nothing written there is lost when the old copy is removed
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=UserProfile)
+@receiver(pre_save, sender=TokenFamily)
+@receiver(pre_delete, sender=User)
+@receiver(pre_delete, sender=UserProfile)
+@receiver(pre_delete, sender=TokenFamily)
+def refuse_frozen_writes(sender, instance, using=None, **kwargs):
+    check_writable(instance_bucket(instance), using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def refuse_frozen_links(sender, instance, action, reverse, model, pk_set, using=None, **kwargs):
+    if not sharding_enabled() or not action.startswith('pre_'):
+        return
+    if not reverse:
+        check_writable(id_bucket(instance.pk), using)
+    elif pk_set is not None:
+        for pk in pk_set:
+            check_writable(id_bucket(pk), using)
+    else:
+        # group.user_set.clear() may touch any user on the shard
+        for bucket in frozen_buckets():
+            check_writable(bucket, using)
+
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, using=None, **kwargs):
     if created:
-    
-        UserProfile.objects.create(user=instance)
-        print(f"User {instance.email} created with role {instance.role.name}")
-    else:
-        print(f"User {instance.email} updated")
\ No newline at end of file
+        UserProfile.objects.using(using).create(user=instance)
+
+
+# Digest scheduling: next_digest_at is only recomputed when the user's time
+# zone or digest frequency changes. Values are read from __dict__ so deferred
+# fields are never fetched just to remember them.
+def _loaded_frequency(profile):
+    return (profile.__dict__.get('communication_preferences') or {}).get('digest_frequency')
+
+
+@receiver(post_init, sender=User)
+def remember_time_zone(sender, instance, **kwargs):
+    instance._loaded_time_zone = instance.__dict__.get('time_zone')
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_digest_frequency(sender, instance, **kwargs):
+    instance._loaded_digest_frequency = _loaded_frequency(instance)
+
+
+@receiver(pre_save, sender=UserProfile)
+def schedule_digest(sender, instance, update_fields=None, using=None, **kwargs):
+    if not instance._state.adding and _loaded_frequency(instance) == instance._loaded_digest_frequency:
+        return
+    schedule_profile(instance)
+    instance._loaded_digest_frequency = _loaded_frequency(instance)
+    if update_fields is not None and 'next_digest_at' not in update_fields:
+        UserProfile.objects.using(using).filter(pk=instance.pk).update(next_digest_at=instance.next_digest_at)
+
+
+@receiver(post_save, sender=User)
+def reschedule_digest(sender, instance, created, using=None, **kwargs):
+    if created or 'time_zone' not in instance.__dict__ or instance.time_zone == instance._loaded_time_zone:
+        return
+    instance._loaded_time_zone = instance.time_zone
+    profile = UserProfile.objects.using(using).filter(user=instance).first()
+    if profile is not None:
+        schedule_profile(profile, instance)
+        UserProfile.objects.using(using).filter(pk=profile.pk).update(next_digest_at=profile.next_digest_at)
@@ -0,0 +1,42 @@
+from django.contrib.auth import authenticate, get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentification.authentication import LeanJWTAuthentication
+
+User = get_user_model()
+
+
+class AuthUserQueryTests(TestCase):
+    """Authentication must select only the auth columns of User"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='lean@example.com', password='Lean-password-123', email_verified=True)
+
+    def assertOnlyAuthColumns(self, user, queries):
+        loaded = {field.attname for field in User._meta.concrete_fields} - user.get_deferred_fields()
+        allowed = {User._meta.pk.attname} | {
+            User._meta.get_field(name).attname for name in User.auth_objects.auth_fields
+            if name in {field.name for field in User._meta.concrete_fields}
+        }
+        self.assertLessEqual(loaded, allowed)
+        user_table = connection.ops.quote_name(User._meta.db_table)
+        for sql in (query['sql'] for query in queries.captured_queries if user_table in query['sql']):
+            for column in {field.column for field in User._meta.concrete_fields} - allowed:
+                self.assertNotIn(connection.ops.quote_name(column), sql)
+
+    def test_login_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            user = authenticate(username='lean@example.com', password='Lean-password-123')
+        self.assertEqual(user, self.user)
+        self.assertOnlyAuthColumns(user, queries)
+
+    def test_jwt_user_resolution(self):
+        token = AccessToken.for_user(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            user = LeanJWTAuthentication().get_user(token)
+        self.assertEqual(len(queries), 1)
+        self.assertOnlyAuthColumns(user, queries)
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from authentification.management.commands.coldstart import parse_importtime
+
+APP_LABEL = __name__.split('.')[0]
+
+# Imported on first use, never at worker start-up
+DEFERRED_MODULES = ('jwt',)
+
+IMPORT_PROBE = """
+import importlib, json, sys
+import django
+django.setup()
+from django.conf import settings
+importlib.import_module(settings.ROOT_URLCONF)
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+class ColdStartImportTests(SimpleTestCase):
+    """
+    A fresh worker must not import deferred modules, and the app's own
+    modules must import well within COLD_START_BUDGET_MS
+
+    One interpreter and a generous margin (a tenth of the budget for code
+    that takes a few ms), so this runs by default without timing noise.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', IMPORT_PROBE],
+            capture_output=True, text=True, env=os.environ.copy()
+        )
+        if result.returncode != 0:
+            raise AssertionError(f"Import probe failed:\n{result.stderr[-2000:]}")
+        cls.modules = set(json.loads(result.stdout.strip().splitlines()[-1]))
+        cls.importtime = parse_importtime(result.stderr)
+
+    def test_deferred_modules(self):
+        imported = [name for name in DEFERRED_MODULES if name in self.modules]
+        self.assertEqual(imported, [], "imported at worker start-up")
+
+    def test_app_import_time(self):
+        budget = getattr(settings, 'COLD_START_BUDGET_MS', 0)
+        if not budget:
+            self.skipTest("COLD_START_BUDGET_MS is disabled")
+        app_ms = sum(self_us for name, self_us, _, _ in self.importtime if name.partition('.')[0] == APP_LABEL) / 1000
+        self.assertLess(app_ms, budget / 10, f"{APP_LABEL} modules take {app_ms:.0f} ms to import")
+
+
+@unittest.skipUnless(os.environ.get('COLD_START_TESTS'), "wall-clock budget, set COLD_START_TESTS=1 to check it")
+class ColdStartBudgetTests(SimpleTestCase):
+    """A fresh worker must import the project and serve a request within COLD_START_BUDGET_MS"""
+
+    def test_time_to_first_request(self):
+        out = StringIO()
+        try:
+            call_command('coldstart', runs=1, stdout=out)
+        except CommandError as e:
+            self.fail(f"{e}\n{out.getvalue()}")
@@ -0,0 +1,203 @@
+import os
+import re
+import tempfile
+import unittest
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentification import password_reset
+from authentification.authentication import LeanJWTAuthentication
+from authentification.models import UserProfile
+from authentification.sharding import (
+    BUCKETS, BucketFrozen, check_writable, email_bucket, frozen_buckets, id_bucket, load_shard_map,
+    new_user_id, shard_for_email, shard_for_user, shard_map, write_shard_map,
+)
+from authentification.utils import verification_token
+
+User = get_user_model()
+
+PASSWORD = 'Shard-password-123'
+
+
+def _recorder(queries):
+    def record(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+    return record
+
+
+@unittest.skipUnless(
+    len(getattr(settings, 'AUTH_SHARDS', [])) >= 2,
+    "needs two or more AUTH_SHARDS, e.g. manage.py test <app>.test_sharding --settings=<sharded settings>"
+)
+class ShardingTests(TestCase):
+    """Users live on the shard of their email hash and are found there without a scatter query"""
+
+    databases = '__all__'
+    client_class = APIClient
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.map_file = os.path.join(directory.name, 'shard-map.json')
+        # The audit log's writer thread is not under test here
+        override = override_settings(
+            AUTH_SHARD_MAP_FILE=self.map_file, AUTH_SHARD_MAP_CHECK_SECONDS=0, AUDIT_LOG_ENABLED=False
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.shards = list(settings.AUTH_SHARDS)
+
+    def as_user(self, user):
+        """
+        Requests below go through the API views, which keep the project's
+        default IsAuthenticated permission; force_authenticate passes it
+        without a query, so only the views' own lookups are counted
+        """
+        self.client.force_authenticate(user)
+
+    def create_users(self, count=None):
+        """``count`` users, or (by default) one user on every shard"""
+        users = []
+        seen = set()
+        for i in range(10000):
+            email = f'shard-user-{i}@example.com'
+            if count is None and shard_for_email(email) in seen:
+                continue
+            seen.add(shard_for_email(email))
+            users.append(User.objects.create_user(email=email, password=PASSWORD, email_verified=True))
+            if len(users) == (count or len(self.shards)):
+                return users
+        self.fail("could not find an email for every shard")
+
+    @contextmanager
+    def assertQueriesOnly(self, alias):
+        """The block must query shard ``alias`` and no other shard"""
+        # execute_wrapper rather than CaptureQueriesContext: test client
+        # requests reset the query log (request_started)
+        queried = {shard: [] for shard in self.shards}
+        with ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(connections[shard].execute_wrapper(_recorder(queried[shard])))
+            yield
+        self.assertNotEqual(queried[alias], [], f"{alias} was not queried")
+        for shard, queries in queried.items():
+            if shard != alias:
+                self.assertEqual(queries, [], f"{shard} was queried")
+
+    def test_email_hash_placement(self):
+        for user in self.create_users():
+            alias = shard_map()[email_bucket(user.email)]
+            self.assertEqual(user._state.db, alias)
+            self.assertEqual(id_bucket(user.pk), email_bucket(user.email))
+            for shard in self.shards:
+                self.assertEqual(User.objects.using(shard).filter(pk=user.pk).exists(), shard == alias)
+            self.assertTrue(UserProfile.objects.using(alias).filter(user_id=user.pk).exists())
+
+    def test_new_user_id_carries_bucket(self):
+        for email in ('a@example.com', 'B@Example.com ', 'c@example.org'):
+            first, second = new_user_id(email), new_user_id(email)
+            self.assertEqual(id_bucket(first), email_bucket(email))
+            self.assertGreater(second, first)
+            self.assertLess(second, 2 ** 63)
+        self.assertEqual(email_bucket('B@Example.com '), email_bucket('b@example.com'))
+
+    def test_login(self):
+        for user in self.create_users():
+            with self.assertQueriesOnly(user._state.db):
+                self.assertEqual(authenticate(username=user.email, password=PASSWORD), user)
+            self.as_user(user)
+            with self.assertQueriesOnly(user._state.db):
+                response = self.client.post(reverse('login'), {'email': user.email, 'password': PASSWORD})
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(response.json()['user_id'], str(user.pk))
+
+    def test_jwt_user_resolution(self):
+        for user in self.create_users():
+            token = AccessToken.for_user(user)
+            with self.assertQueriesOnly(user._state.db):
+                self.assertEqual(LeanJWTAuthentication().get_user(token), user)
+
+    def test_verify_email(self):
+        for user in self.create_users():
+            alias = user._state.db
+            User.objects.using(alias).filter(pk=user.pk).update(email_verified=False)
+            self.as_user(user)
+            with self.assertQueriesOnly(alias):
+                response = self.client.get(reverse('verify-email'), {'token': verification_token(user)})
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertTrue(User.objects.using(alias).get(pk=user.pk).email_verified)
+
+    def test_password_reset(self):
+        for user in self.create_users():
+            alias = user._state.db
+            mail.outbox = []
+            # The lookup request_password_reset hands to its worker thread
+            with self.assertQueriesOnly(alias):
+                password_reset._send(user.email, 'test-key')
+            self.assertEqual(len(mail.outbox), 1)
+            token = re.search(r'token=(\S+)', mail.outbox[0].body).group(1)
+            self.as_user(user)
+            with self.assertQueriesOnly(alias):
+                response = self.client.post(
+                    reverse('password-reset-confirm'), {'token': token, 'new_password': 'Another-shard-pw-456'}
+                )
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertTrue(User.objects.using(alias).get(pk=user.pk).check_password('Another-shard-pw-456'))
+
+    def test_rebalance_moves_buckets(self):
+        with override_settings(AUTH_SHARDS=self.shards[:-1]):
+            users = self.create_users(count=60)
+            before = {user.pk: user._state.db for user in users}
+            self.assertNotIn(self.shards[-1], before.values())
+            call_command('rebalanceusers', shards=','.join(self.shards), settle_seconds=0, stdout=StringIO())
+
+        buckets, frozen = load_shard_map(self.map_file)
+        self.assertEqual(frozen, frozenset())
+        counts = Counter(shard_map(refresh=True))
+        self.assertEqual(sorted(counts), sorted(self.shards))
+        self.assertLessEqual(max(counts.values()) - min(counts.values()), 1)
+        self.assertEqual(sum(counts.values()), BUCKETS)
+        moved = 0
+        for pk, old_alias in before.items():
+            alias = shard_for_user(pk)
+            moved += alias != old_alias
+            for shard in self.shards:
+                self.assertEqual(User.objects.using(shard).filter(pk=pk).exists(), shard == alias)
+            self.assertTrue(UserProfile.objects.using(alias).filter(user_id=pk).exists())
+        self.assertGreater(moved, 0)
+
+    def test_frozen_bucket_refuses_writes(self):
+        user, other = self.create_users()[:2]
+        alias, bucket = user._state.db, id_bucket(user.pk)
+        write_shard_map(self.map_file, shard_map(), frozen={bucket})
+        self.assertEqual(frozen_buckets(refresh=True), {bucket})
+
+        with self.assertRaises(BucketFrozen):
+            check_writable(bucket, alias)
+        # Writes to the shard the bucket is copied to are allowed
+        check_writable(bucket, other._state.db)
+        with self.assertRaises(BucketFrozen):
+            user.save()
+        with self.assertRaises(BucketFrozen), transaction.atomic(using=alias):
+            user.delete()
+        # Reads and other buckets are unaffected
+        self.assertEqual(User.objects.using(alias).get(pk=user.pk), user)
+        other.first_name = 'Other'
+        other.save()
+
+        write_shard_map(self.map_file, shard_map())
+        self.assertEqual(frozen_buckets(refresh=True), frozenset())
+        user.first_name = 'Thawed'
+        user.save()
@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone as tz
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import TokenFamily, User
+from .sharding import check_writable, family_bucket, new_family, shard_for_family, shard_for_user
+
+FAMILY_CLAIM = 'fam'
+REVOKED = '!'
+
+
+class TokenFamilyStore:
+    """
+    Keeps the jti of the current refresh token of every token family.
+
+    Each family is one short cache key holding the current jti (or REVOKED),
+    so checking a presented refresh token costs a single lookup. Writes go
+    through to the TokenFamily table, which is only read when the cache misses
+    or disagrees with the presented token.
+    """
+    key_prefix = 'tokfam'
+
+    def __init__(self, cache_alias='default', use_database=True, timeout=None):
+        self.cache = caches[cache_alias]
+        self.use_database = use_database
+        self.timeout = timeout or int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+    def _key(self, family):
+        return f'{self.key_prefix}:{family}'
+
+    def _claim_key(self, jti):
+        return f'{self.key_prefix}:used:{jti}'
+
+    def _expires_at(self):
+        return tz.now() + api_settings.REFRESH_TOKEN_LIFETIME
+
+    def start(self, family, jti, user_id):
+        self.cache.set(self._key(family), jti, self.timeout)
+        if self.use_database:
+            TokenFamily.objects.using(shard_for_user(user_id)).create(
+                family=family,
+                user_id=user_id,
+                current_jti=jti,
+                expires_at=self._expires_at()
+            )
+
+    def _load(self, family):
+        row = TokenFamily.objects.using(_family_db(family)).filter(family=family).values_list(
+            'current_jti', 'revoked', 'expires_at'
+        ).first()
+        if row is None:
+            return None
+        jti, revoked, expires_at = row
+        value = REVOKED if revoked else jti
+        ttl = int((expires_at - tz.now()).total_seconds())
+        if ttl > 0:
+            self.cache.set(self._key(family), value, ttl)
+        return value
+
+    def current(self, family, expected=None):
+        """
+        Return the current jti of a family, REVOKED, or None if unknown.
+
+        When ``expected`` is given and the cache disagrees with it, the
+        database is consulted before the answer is trusted, so a stale
+        per-process cache never revokes a legitimate family.
+        """
+        value = self.cache.get(self._key(family))
+        if self.use_database and (value is None or (expected is not None and value != expected)):
+            value = self._load(family)
+        return value
+
+    def rotate(self, family, old_jti, new_jti):
+        """
+        Move a family from ``old_jti`` to ``new_jti``.
+
+        Returns False when ``old_jti`` is not the current token of the family,
+        i.e. an already rotated token was presented again.
+        """
+        if self.current(family, expected=old_jti) != old_jti:
+            return False
+        if self.use_database:
+            alias = _writable_shard(family)
+        if not self.cache.add(self._claim_key(old_jti), 1, self.timeout):
+            return False
+        if self.use_database:
+            updated = TokenFamily.objects.using(alias).filter(
+                family=family, current_jti=old_jti, revoked=False
+            ).update(current_jti=new_jti, expires_at=self._expires_at())
+            if not updated:
+                return False
+        self.cache.set(self._key(family), new_jti, self.timeout)
+        return True
+
+    def revoke(self, family):
+        if self.use_database:
+            alias = _writable_shard(family)
+        self.cache.set(self._key(family), REVOKED, self.timeout)
+        if self.use_database:
+            TokenFamily.objects.using(alias).filter(family=family).update(revoked=True)
+
+    def revoked_many(self, families):
+        """
+        The subset of ``families`` that has been revoked.
+
+        One cache get_many, plus one query (per shard involved) for the
+        families the cache does not know.
+        """
+        keys = {self._key(family): family for family in families}
+        cached = self.cache.get_many(list(keys))
+        revoked = {keys[key] for key, value in cached.items() if value == REVOKED}
+        unknown = [family for key, family in keys.items() if key not in cached]
+        if unknown and self.use_database:
+            for alias, group in _by_shard(unknown, _family_db).items():
+                revoked.update(
+                    TokenFamily.objects.using(alias).filter(family__in=group, revoked=True)
+                    .values_list('family', flat=True)
+                )
+        return revoked
+
+
+def _family_db(family):
+    """
+    Database to read a family from: its shard, or the primary (never a
+    replica, whose lagging copy would look like token reuse)
+    """
+    return shard_for_family(family) or DEFAULT_DB_ALIAS
+
+
+def _writable_shard(family):
+    """Shard of a family, checked against a rebalance in progress (BucketFrozen)"""
+    alias = shard_for_family(family)
+    if alias is not None:
+        check_writable(family_bucket(family), alias)
+    return alias
+
+
+def _by_shard(keys, shard_for):
+    groups = {}
+    for key in keys:
+        groups.setdefault(shard_for(key), []).append(key)
+    return groups
+
+
+_store = None
+
+
+def get_token_family_store():
+    global _store
+    if _store is None:
+        _store = TokenFamilyStore(
+            cache_alias=getattr(settings, 'TOKEN_FAMILY_CACHE_ALIAS', 'default'),
+            use_database=getattr(settings, 'TOKEN_FAMILY_USE_DATABASE', True),
+        )
+    return _store
+
+
+def issue_refresh_token(user):
+    """Create a refresh token that starts a new token family."""
+    refresh = RefreshToken.for_user(user)
+    # Sharded ids exceed 2**53, so clients get them as strings (see new_user_id)
+    refresh[api_settings.USER_ID_CLAIM] = str(user.pk)
+    family = new_family(user.pk)
+    refresh[FAMILY_CLAIM] = family
+    get_token_family_store().start(family, refresh[api_settings.JTI_CLAIM], user.pk)
+    return refresh
+
+
+def revoke_token_family(token):
+    family = token.get(FAMILY_CLAIM)
+    if family:
+        get_token_family_store().revoke(family)
+
+
+def revoked_sessions(sessions):
+    """
+    The subset of ``sessions`` ((user_id, family) pairs taken from access
+    tokens, ids as int or string) that may no longer be used: the user was deactivated or deleted,
+    or the token family was revoked (logout, refresh token reuse).
+
+    Costs one user query and one batched family lookup (per shard
+    involved), however many sessions are checked.
+    """
+    user_ids = {user_id for user_id, _ in sessions}
+    allowed = set()
+    for alias, group in _by_shard(user_ids, shard_for_user).items():
+        allowed.update(
+            str(pk) for pk in User.objects.using(alias).filter(pk__in=group, is_active=True, is_deleted=False)
+            .values_list('pk', flat=True)
+        )
+    families = {family for _, family in sessions if family}
+    revoked = get_token_family_store().revoked_many(families) if families else set()
+    return {
+        (user_id, family) for user_id, family in sessions
+        if str(user_id) not in allowed or family in revoked
+    }
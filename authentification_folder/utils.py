@@ -1,41 +1,56 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, send_mail
 from django.conf import settings
 from rest_framework.response import Response
 from rest_framework import status
-import jwt
-from datetime import datetime, timedelta
-def send_verification_email(user):
-    token = jwt.encode({
-        'user_id': user.id,
-        'exp': datetime.now() + timedelta(hours=24),
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+VERIFICATION_TOKEN_LIFETIME = timedelta(hours=24)
+
+def verification_token(user, expires_at=None):
+    import jwt  # PyJWT is only needed once a token is minted
+    if expires_at is None:
+        expires_at = datetime.now(timezone.utc) + VERIFICATION_TOKEN_LIFETIME
+    return jwt.encode({
+        'user_id': str(user.id),
+        'exp': expires_at,
+        'jti': uuid4().hex,
         'type': 'email_verification'
     }, settings.SECRET_KEY, algorithm='HS256')
+
+def verification_tokens(users):
+    """Mint verification tokens for a batch of users, sharing one expiry"""
+    expires_at = datetime.now(timezone.utc) + VERIFICATION_TOKEN_LIFETIME
+    return {user.id: verification_token(user, expires_at) for user in users}
+
+def build_verification_email(user, token=None, connection=None):
+    if token is None:
+        token = verification_token(user)
     subject = "Reset your password"
     message = f"Hi {user.email},\n\nPlease reset your password by clicking the link below:\n\n"
     message += f"http://127.0.0.1:8000/api/v1/auth/verify-email/?token={token}\n\n"
     message += "This link is valid for 24 hour.\n\nThank you,\nALGECOM Team"
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], connection=connection)
+
+def send_verification_email(user):
     try:
-        send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-                    [user.email],
-                    fail_silently=False,
-                )
+        build_verification_email(user).send(fail_silently=False)
     except Exception as e:
-                # Log the error but do not reveal to the client
-                print(f"Error sending password reset email: {e}")
-                return Response(
-                    {"error": "Failed to send password reset email."},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+        # Log the error but do not reveal to the client (fails fast while the SMTP circuit is open)
+        print(f"Error sending verification email: {e}")
+        return Response(
+            {"error": "Failed to send verification email."},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
                 
                 
 from django.urls import reverse
 def send_password_reset_email(user):
+    import jwt
     token = jwt.encode({
-        'user_id': user.id,
-        'exp': datetime.now(datetime.timezone.utc) + timedelta(hours=1),
+        'user_id': str(user.id),
+        'exp': datetime.now(timezone.utc) + timedelta(hours=1),
+        'jti': uuid4().hex,
         'type': 'password_reset'
     }, settings.SECRET_KEY, algorithm='HS256')
 
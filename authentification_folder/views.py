@@ -1,14 +1,27 @@
-import jwt
-from rest_framework import generics, status
+from rest_framework import status
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.views import TokenRefreshView
 from authentification.models import User
-from .serializers import PasswordResetConfirmSerializer, PasswordResetRequestSerializer, RegisterSerializer, LoginSerializer
+from .serializers import PasswordResetConfirmSerializer, PasswordResetRequestSerializer, RegisterSerializer, LoginSerializer, RotatingTokenRefreshSerializer, TokenIntrospectionSerializer
 from rest_framework.views import APIView
-from .utils import send_password_reset_email, send_verification_email
+from rest_framework.permissions import IsAdminUser
+from .audit import EMAIL_VERIFIED, LOGOUT, PASSWORD_RESET, PASSWORD_RESET_REQUESTED, audit
+from .idempotency import idempotent
+from .introspection import introspect_tokens
+from .mail import get_mail_breaker
+from .one_time_tokens import consume_token
+from .permissions import HasServiceAPIKey
+from .password_reset import request_password_reset
+from .routers import replica_metrics
+from .sharding import shard_for_user
+from .token_families import revoke_token_family
+from .utils import send_verification_email
 from django.conf import settings
 class RegisterView(APIView):
+    @idempotent('register')
     def post(self,request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
@@ -26,6 +39,7 @@ class RegisterView(APIView):
         
 class VerifyEmailView(APIView):
     def get(self,request):
+        import jwt  # loaded on first use, not at worker start-up
         
         token = request.GET.get('token')
         if not token:
@@ -40,10 +54,16 @@ class VerifyEmailView(APIView):
                     {"error": "Invalid token type."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            user = User.objects.get(id=payload['user_id'])
+            if not consume_token(payload):
+                return Response(
+                    {"error": "Token has already been used."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            user = User.auth_objects.using(shard_for_user(payload['user_id'])).get(id=payload['user_id'])
             if not user.email_verified:
                 user.email_verified = True
-                user.save()
+                user.save(update_fields=['email_verified'])
+                audit(EMAIL_VERIFIED, request, user)
                 return Response(
                     {"message": "Email verified successfully."},
                     status=status.HTTP_200_OK
@@ -83,12 +103,20 @@ class LoginView(APIView):
         data = serializer.validated_data
         return Response(data, status=status.HTTP_200_OK)
  
+class RotatingTokenRefreshView(TokenRefreshView):
+    serializer_class = RotatingTokenRefreshSerializer
+
+
 class UserLogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data['refresh']
             token = RefreshToken(refresh_token)
-            token.blacklist()
+            revoke_token_family(token)
+            audit(LOGOUT, request, token.get(api_settings.USER_ID_CLAIM))
+            # Only available when rest_framework_simplejwt.token_blacklist is installed
+            if hasattr(token, 'blacklist'):
+                token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except TokenError:
             return Response(
@@ -97,29 +125,20 @@ class UserLogoutView(APIView):
             )
             
 class PasswordResetRequestView(APIView):
+    @idempotent('password-reset')
     def post(self,request):
         serializer = PasswordResetRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        email = serializer.validated_data['email']
-        try:
-            user= User.objects.get(email=email)
-            send_password_reset_email(user)
-            return Response(
-                {"message": "Password reset email sent."},
-                status=status.HTTP_200_OK
-            )
-        except User.DoesNotExist:
-            return Response(
-                {"error": "User with this email does not exist."},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        except Exception as e:
-            return Response(
-                {"error": str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # Same response whether or not the account exists, and for repeated requests
+        request_password_reset(serializer.validated_data['email'])
+        audit(PASSWORD_RESET_REQUESTED, request, email=serializer.validated_data['email'])
+        return Response(
+            {"message": "If an account exists for this email, a password reset link has been sent."},
+            status=status.HTTP_200_OK
+        )
 class PasswordResetConfirmView(APIView):
     def post(self,request):
+        import jwt
         serializer = PasswordResetConfirmSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         try:
@@ -133,9 +152,15 @@ class PasswordResetConfirmView(APIView):
                     {"error": "Invalid token type."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            user = User.objects.get(id=payload['user_id'])
+            if not consume_token(payload):
+                return Response(
+                    {"error": "Token has already been used."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            user = User.auth_objects.using(shard_for_user(payload['user_id'])).get(id=payload['user_id'])
             user.set_password(serializer.validated_data['new_password'])
-            user.save()
+            user.save(update_fields=['password'])
+            audit(PASSWORD_RESET, request, user)
             return Response(
                 {"message": "Password reset successfully."},
                 status=status.HTTP_200_OK
@@ -159,4 +184,32 @@ class PasswordResetConfirmView(APIView):
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class DatabaseRoutingMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(replica_metrics(), status=status.HTTP_200_OK)
+
+
+class MailMetricsView(APIView):
+    """State and counters of the SMTP circuit breaker"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_mail_breaker().stats(), status=status.HTTP_200_OK)
+
+
+class TokenIntrospectionView(APIView):
+    """Batch access token validation for internal gateways (one call per burst of tokens)"""
+    authentication_classes = []
+    permission_classes = [HasServiceAPIKey]
+
+    def post(self, request):
+        serializer = TokenIntrospectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        response = Response({"results": introspect_tokens(serializer.validated_data['tokens'])}, status=status.HTTP_200_OK)
+        response['Cache-Control'] = 'no-store'
+        return response
@@ -0,0 +1,235 @@
+import asyncio
+import math
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import User
+from .sharding import shard_for_user
+from .token_families import FAMILY_CLAIM, REVOKED, get_token_family_store, revoked_sessions
+
+# Close codes sent to the client (4000-4999 are free for applications)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_TOKEN_EXPIRED = 4001
+CLOSE_REVOKED = 4003
+
+
+class _Connection:
+    __slots__ = ('send', 'user_id', 'family', 'expires_at', 'deadline', 'slot', 'closed')
+
+    def __init__(self, send, user_id, family, expires_at):
+        self.send = send
+        self.user_id = user_id
+        self.family = family
+        self.expires_at = expires_at
+        self.deadline = None
+        self.slot = None
+        self.closed = False
+
+    async def close(self, code):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.send({'type': 'websocket.close', 'code': code})
+        except Exception:
+            pass
+
+
+class TimerWheel:
+    """
+    Expiry and revalidation deadlines of every authenticated socket in the process.
+
+    Deadlines are hashed into ``slots`` buckets of ``tick`` seconds and one
+    task walks the wheel, so the cost per connection is a set insert; there is
+    no task or timer handle per socket. Connections whose deadline falls in
+    the current bucket are closed if their token expired, otherwise
+    revalidated together (one query for all of them) and rescheduled.
+    """
+
+    def __init__(self, tick=1.0, slots=512, revalidate_seconds=60):
+        self.tick = tick
+        self.revalidate_seconds = revalidate_seconds
+        self.slots = [set() for _ in range(slots)]
+        self.size = 0
+        self._cursor = 0
+        self._task = None
+        self._revalidations = set()
+
+    def _index(self, moment):
+        return math.ceil(moment / self.tick)
+
+    def schedule(self, conn):
+        now = time.time()
+        if self._task is None or self._task.done():
+            self._cursor = self._index(now)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        conn.deadline = min(conn.expires_at, now + self.revalidate_seconds)
+        # A deadline already behind the cursor goes in the next bucket visited
+        index = max(self._index(conn.deadline), self._cursor)
+        conn.slot = self.slots[index % len(self.slots)]
+        conn.slot.add(conn)
+        self.size += 1
+
+    def cancel(self, conn):
+        if conn.slot is not None and conn in conn.slot:
+            conn.slot.discard(conn)
+            self.size -= 1
+        conn.slot = None
+
+    async def _run(self):
+        while self.size:
+            await asyncio.sleep(max(0.0, self._cursor * self.tick - time.time()))
+            now = time.time()
+            # Catch up on every bucket passed while sleeping or closing sockets
+            due = []
+            while self._cursor * self.tick <= now:
+                slot = self.slots[self._cursor % len(self.slots)]
+                due.extend(conn for conn in slot if conn.deadline <= now)
+                self._cursor += 1
+            for conn in due:
+                self.cancel(conn)
+                if conn.expires_at <= now:
+                    await conn.close(CLOSE_TOKEN_EXPIRED)
+            live = [conn for conn in due if not conn.closed]
+            if live:
+                # Off the wheel's task, so a slow database never delays expiry closes
+                task = asyncio.get_running_loop().create_task(self._revalidate(live))
+                self._revalidations.add(task)
+                task.add_done_callback(self._revalidations.discard)
+
+    async def _revalidate(self, connections):
+        try:
+            revoked = await sync_to_async(revoked_connections, thread_sensitive=False)(connections)
+        except Exception as e:
+            print(f"Error revalidating websocket connections: {e}")
+            revoked = set()
+        for conn in connections:
+            if conn in revoked:
+                await conn.close(CLOSE_REVOKED)
+            elif not conn.closed:
+                self.schedule(conn)
+
+
+def revoked_connections(connections):
+    """Connections whose user was deactivated/deleted or whose token family was revoked"""
+    revoked = revoked_sessions({(conn.user_id, conn.family) for conn in connections})
+    return {conn for conn in connections if (conn.user_id, conn.family) in revoked}
+
+
+def _raw_token(scope):
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            kind, _, token = value.decode('latin-1').partition(' ')
+            if kind in api_settings.AUTH_HEADER_TYPES:
+                return token
+    return None
+
+
+def _has_role():
+    # Models generated without the role system (roles = false) have no role field
+    try:
+        User._meta.get_field('role')
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def _authenticate(raw_token):
+    """Validate an access token; returns (user with role, token) or (None, None)"""
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None, None
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    users = User.auth_objects.using(shard_for_user(user_id))
+    if _has_role():
+        users = users.select_related('role')
+    user = users.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+    if user is None or not user.is_active or user.is_deleted:
+        return None, None
+    family = token.get(FAMILY_CLAIM)
+    if family and get_token_family_store().current(family) == REVOKED:
+        return None, None
+    return user, token
+
+
+_wheel = None
+
+
+def get_timer_wheel():
+    global _wheel
+    if _wheel is None:
+        _wheel = TimerWheel(
+            tick=getattr(settings, 'WEBSOCKET_AUTH_TICK_SECONDS', 1),
+            revalidate_seconds=getattr(settings, 'WEBSOCKET_AUTH_REVALIDATE_SECONDS', 60)
+        )
+    return _wheel
+
+
+class JWTWebSocketMiddleware:
+    """
+    ASGI middleware authenticating WebSocket connections with the app's access tokens.
+
+    The token is read from the ``token`` query parameter or an
+    ``Authorization: Bearer`` header at handshake. On success the user is
+    stored in ``scope['user']`` and its role in ``scope['role']`` (None
+    without the role system) for the whole connection; otherwise the
+    handshake is refused. The socket is closed when the token
+    expires, or at the next revalidation after the user is deactivated or
+    logs out. Other scope types are passed through untouched::
+
+        application = JWTWebSocketMiddleware(websocket_app)
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket':
+            return await self.inner(scope, receive, send)
+
+        raw_token = _raw_token(scope)
+        user, token = (None, None)
+        if raw_token:
+            user, token = await sync_to_async(_authenticate)(raw_token)
+        if user is None:
+            message = await receive()
+            if message['type'] == 'websocket.connect':
+                await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+            return
+
+        conn = _Connection(send, user.pk, token.get(FAMILY_CLAIM), token['exp'])
+        wheel = get_timer_wheel()
+
+        async def tracked_receive():
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                conn.closed = True
+                wheel.cancel(conn)
+            return message
+
+        async def tracked_send(message):
+            if conn.closed and message['type'] != 'websocket.close':
+                return
+            if message['type'] == 'websocket.close':
+                conn.closed = True
+                wheel.cancel(conn)
+            await send(message)
+
+        scope = dict(scope, user=user, role=getattr(user, 'role', None), auth_token=token)
+        wheel.schedule(conn)
+        try:
+            return await self.inner(scope, tracked_receive, tracked_send)
+        finally:
+            conn.closed = True
+            wheel.cancel(conn)
@@ -1,17 +1,43 @@
 import os
 import sys
+import json
+import hashlib
+import platform
+import secrets
+import argparse
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import shutil
 import re
 
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from generation_manifest import GenerationManifest, replace_section
+from import_rewriter import rewrite_tree
+from orchestrator import PhaseGraph, run_django_commands
+
 # Import the user model customizer
 try:
-    from user_model_customizer import customize_user_model
+    from user_model_customizer import customize_user_model, get_user_preferences, preferences_from_spec
 except ImportError:
     print("Warning: user_model_customizer.py not found. User model customization will be skipped.")
     customize_user_model = None
 
+# Templates and requirements are read next to this script, so generation can
+# run from (and into) any directory
+BASE_DIR = Path(__file__).resolve().parent
+TEMPLATES_DIR = BASE_DIR / 'scaffold_templates'
+
+# Wheelhouses and venv snapshots shared by every scaffold on this machine
+CACHE_DIR = Path(os.environ.get(
+    'BOILER_CACHE_DIR',
+    Path.home() / '.cache' / 'django-rest-auth-generator'
+))
+
 def create_file(file_path, content):
     with open(file_path, 'w') as f:
         f.write(content)
@@ -24,7 +50,17 @@ def run_command(command):
         print(e)
         sys.exit(1)
 
-def update_import_statements(app_dir, old_app_name="authentification", new_app_name=None):
+def _report_rewrites(results, base_dir):
+    for result in results:
+        relative = os.path.relpath(result['path'], base_dir)
+        if result['error']:
+            print(f"  Error updating {relative}: {result['error']}")
+        elif result['diff']:
+            print(result['diff'], end='')
+        elif result['changed'] and result['written']:
+            print(f"  Updated: {relative}")
+
+def update_import_statements(app_dir, old_app_name="authentification", new_app_name=None, dry_run=False):
     """
     Update import statements in Python files to use the new app name
     
@@ -32,93 +68,51 @@ def update_import_statements(app_dir, old_app_name="authentification", new_app_n
         app_dir (str): Path to the app directory
         old_app_name (str): Old app name to replace (default: "authentification")
         new_app_name (str): New app name to use in imports
+        dry_run (bool): Print a diff instead of writing the files
     """
     if not new_app_name:
         print("Error: new_app_name is required")
         return
     
-    app_path = Path(app_dir)
-    
-    if not app_path.exists():
+    if not Path(app_dir).exists():
         print(f"Warning: App directory {app_dir} not found")
         return
     
-    # Find all Python files in the app directory
-    python_files = list(app_path.glob("**/*.py"))
-    
-    if not python_files:
-        print(f"No Python files found in {app_dir}")
-        return
-    
     print(f"Updating import statements from '{old_app_name}' to '{new_app_name}'...")
-    
-    for py_file in python_files:
-        try:
-            # Read the file content
-            with open(py_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            original_content = content
-            
-            # Pattern to match various import formats
-            import_patterns = [
-                # from .authentification import something
-                (rf'from \.{re.escape(old_app_name)}', f'from .{new_app_name}'),
-                # from authentification import something
-                (rf'from {re.escape(old_app_name)}(?=\s)', f'from {new_app_name}'),
-                # import authentification.something
-                (rf'import {re.escape(old_app_name)}(?=\.)', f'import {new_app_name}'),
-                # from authentification.something import
-                (rf'from {re.escape(old_app_name)}\.', f'from {new_app_name}.'),
-            ]
-            
-            # Apply all patterns
-            for pattern, replacement in import_patterns:
-                content = re.sub(pattern, replacement, content)
-            
-            # Check if any changes were made
-            if content != original_content:
-                # Write the updated content back to the file
-                with open(py_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                print(f"  Updated: {py_file.relative_to(app_path)}")
-            
-        except Exception as e:
-            print(f"  Error updating {py_file}: {e}")
-    
+    results = rewrite_tree(app_dir, app_dir, old_app_name, new_app_name, dry_run=dry_run)
+    _report_rewrites(results, app_dir)
     print(f"Import statement update completed for {app_dir}")
 
-def copy_authentication_files(source_dir, dest_dir, app_name):
+def copy_authentication_files(source_dir, dest_dir, app_name, dry_run=False, manifest=None, exclude=()):
     """
     Copy files from /authentification to the new app directory and update imports
     
+    Imports are rewritten while copying, so every file is written once, and
+    files whose content is already up to date are not written at all.
+    
     Args:
         source_dir (str): Source directory path
         dest_dir (str): Destination directory path  
         app_name (str): New app name for updating imports
+        dry_run (bool): Print a diff of the import changes instead of copying
+        manifest (GenerationManifest): Records the hash of every copied file
+        exclude (tuple): Paths relative to source_dir that are not copied
     """
-    source_path = Path(source_dir)
-    dest_path = Path(dest_dir)
-    
-    if source_path.exists():
-        try:
-            # Copy all files from source to destination
-            for item in source_path.iterdir():
-                if item.is_file():
-                    shutil.copy2(item, dest_path)
-                    print(f"Copied: {item.name}")
-                elif item.is_dir():
-                    dest_subdir = dest_path / item.name
-                    shutil.copytree(item, dest_subdir, dirs_exist_ok=True)
-                    print(f"Copied directory: {item.name}")
-            
-            # Update import statements in the copied files
-            update_import_statements(dest_dir, "authentification", app_name)
-            
-        except Exception as e:
-            print(f"Error copying files: {e}")
-    else:
+    if not Path(source_dir).exists():
         print(f"Warning: Source directory {source_dir} not found. Skipping file copy.")
+        return
+    
+    try:
+        results = rewrite_tree(source_dir, dest_dir, "authentification", app_name, dry_run=dry_run, exclude=exclude)
+        if not dry_run:
+            written = sum(1 for result in results if result['written'])
+            print(f"Copied {written} changed files ({len(results) - written} already up to date)")
+            if manifest is not None:
+                for result in results:
+                    manifest.record(result['path'], result['sha256'], result['written'])
+        _report_rewrites(results, dest_dir)
+    except Exception as e:
+        print(f"Error copying files: {e}")
 
 def check_existing_venv():
     """Check for existing virtual environments in current directory"""
@@ -141,11 +135,501 @@ def check_existing_venv():
     
     return existing_venvs
 
-def main():
-    # Get project details
-    project_name = input("Enter your Django project name: ").strip()
-    app_name = input("Enter authentication app name: ").strip()
-    
+def requirements_hash(requirements_file):
+    """
+    Hash a requirements file, its -r includes and the interpreter it targets
+
+    Wheels and venvs are only reusable for the same Python and platform, so
+    those are part of the key.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{sys.version_info[:2]}|{sys.platform}|{platform.machine()}".encode())
+
+    def feed(path):
+        content = Path(path).read_bytes()
+        digest.update(content)
+        for line in content.decode('utf-8').splitlines():
+            line = line.strip()
+            if line.startswith(('-r ', '--requirement ')):
+                feed(Path(path).parent / line.split(None, 1)[1])
+
+    feed(requirements_file)
+    return digest.hexdigest()[:16]
+
+def clone_tree(source, dest):
+    """
+    Clone a virtual environment using hardlinks (falling back to copies)
+
+    Scripts in bin/ (Scripts/ on Windows) and pyvenv.cfg embed the absolute
+    venv path, so those are copied with the path rewritten instead of linked.
+    """
+    source = Path(source).resolve()
+    dest = Path(dest).resolve()
+    old_prefix = str(source).encode()
+    new_prefix = str(dest).encode()
+
+    for root, dirs, files in os.walk(source):
+        root_path = Path(root)
+        relative = root_path.relative_to(source)
+        target_root = dest / relative
+        target_root.mkdir(parents=True, exist_ok=True)
+
+        for name in list(dirs):
+            if (root_path / name).is_symlink():
+                os.symlink(os.readlink(root_path / name), target_root / name)
+                dirs.remove(name)
+
+        for name in files:
+            src_file = root_path / name
+            dst_file = target_root / name
+            if src_file.is_symlink():
+                os.symlink(os.readlink(src_file), dst_file)
+                continue
+            if name == 'pyvenv.cfg' or relative.parts[:1] in (('bin',), ('Scripts',)):
+                data = src_file.read_bytes()
+                if old_prefix in data and not name.endswith('.exe'):
+                    dst_file.write_bytes(data.replace(old_prefix, new_prefix))
+                    shutil.copymode(src_file, dst_file)
+                    continue
+            try:
+                os.link(src_file, dst_file)
+            except OSError:
+                shutil.copy2(src_file, dst_file)
+
+def _publish(tmp_path, final_path):
+    """Atomically move a freshly built cache entry into place (losers of a race discard theirs)"""
+    try:
+        os.rename(tmp_path, final_path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+def ensure_wheelhouse(python_cmd, requirements_file, key, offline=False):
+    """
+    Return the wheelhouse for a requirements hash, building it if needed
+
+    Returns:
+        Path: Directory of wheels, or None when offline and not cached
+    """
+    wheelhouse = CACHE_DIR / 'wheels' / key
+    if wheelhouse.exists():
+        return wheelhouse
+    if offline:
+        print(f"Error: no cached wheelhouse for {requirements_file.name} and --offline was given")
+        return None
+
+    print(f"Building wheelhouse for {requirements_file.name} (first run only)...")
+    wheelhouse.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = wheelhouse.with_name(f"{key}.tmp-{os.getpid()}")
+    run_command(f'"{python_cmd}" -m pip wheel -q -r "{requirements_file}" -w "{tmp_path}"')
+    _publish(tmp_path, wheelhouse)
+    return wheelhouse
+
+def prepare_virtualenv(env_name, requirements_file, offline=False, use_cache=True):
+    """
+    Create (or reuse) the project venv with the requirements installed
+
+    A cached snapshot of a venv built from the same requirements is cloned
+    when available; otherwise the venv is built from the local wheelhouse
+    and then snapshotted for the next scaffold.
+
+    Returns:
+        bool: True when the venv is ready
+    """
+    venv_path = Path(env_name)
+    python_cmd = venv_python(env_name)
+
+    if not use_cache:
+        if not venv_path.exists():
+            print(f"\nCreating virtual environment: {env_name}")
+            run_command(f'"{sys.executable}" -m venv {env_name}')
+        print(f"\nInstalling packages from {requirements_file.name}...")
+        run_command(f'{python_cmd} -m pip install -r "{requirements_file}"')
+        return True
+
+    key = requirements_hash(requirements_file)
+    snapshot = CACHE_DIR / 'venvs' / key
+
+    if not venv_path.exists() and snapshot.exists():
+        print(f"\nCloning cached virtual environment into {env_name}")
+        clone_tree(snapshot, venv_path)
+        return True
+
+    if venv_path.exists():
+        print(f"\nUsing existing virtual environment: {env_name}")
+        fresh = False
+    else:
+        print(f"\nCreating virtual environment: {env_name}")
+        run_command(f'"{sys.executable}" -m venv {env_name}')
+        fresh = True
+
+    wheelhouse = ensure_wheelhouse(python_cmd, requirements_file, key, offline)
+    if wheelhouse is None:
+        return False
+    print(f"\nInstalling packages from {requirements_file.name} (cached wheels)...")
+    run_command(f'{python_cmd} -m pip install -q --no-index --find-links "{wheelhouse}" -r "{requirements_file}"')
+
+    if fresh and not snapshot.exists():
+        snapshot.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = snapshot.with_name(f"{key}.tmp-{os.getpid()}")
+        clone_tree(venv_path, tmp_path)
+        _publish(tmp_path, snapshot)
+    return True
+
+def venv_python(env_name):
+    if sys.platform == 'win32':
+        return f"{env_name}\\Scripts\\python"
+    return f"{env_name}/bin/python"
+
+def django_version():
+    """Django version pinned in requirements.txt (used in rendered templates)"""
+    match = re.search(r"^Django==([\d.]+)", (BASE_DIR / "requirements.txt").read_text(), re.MULTILINE | re.IGNORECASE)
+    return match.group(1) if match else "5.2"
+
+def render_template_dir(template_dir, dest_dir, context, manifest=None):
+    """
+    Render a bundled startproject/startapp template tree
+
+    ``project_name`` in paths and ``{{ key }}`` placeholders in file contents
+    are replaced from ``context``; the ``-tpl`` suffix is dropped. With a
+    manifest, files that already exist are kept (like startproject, the
+    skeleton is only created once).
+    """
+    template_dir = Path(template_dir)
+    dest_dir = Path(dest_dir)
+    for template in sorted(template_dir.rglob('*-tpl')):
+        relative = template.relative_to(template_dir).as_posix()[:-len('-tpl')]
+        relative = relative.replace('project_name', context.get('project_name', 'project_name'))
+        content = template.read_text(encoding='utf-8')
+        for key, value in context.items():
+            content = content.replace('{{ ' + key + ' }}', value)
+        target = dest_dir / relative
+        if manifest is not None:
+            manifest.write(target, content, overwrite=False)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        create_file(target, content)
+
+def render_project(project_name, manifest=None):
+    """Equivalent of ``django-admin startproject <name> .`` without booting Django"""
+    version = django_version()
+    chars = 'abcdefghijklmnopqrstuvwxyz0123456789!@#$%^&*(-_=+)'
+    render_template_dir(TEMPLATES_DIR / 'project_template', '.', {
+        'project_name': project_name,
+        'secret_key': 'django-insecure-' + ''.join(secrets.choice(chars) for _ in range(50)),
+        'django_version': version,
+        'docs_version': '.'.join(version.split('.')[:2]),
+    }, manifest)
+
+def render_app(app_name, manifest=None):
+    """Equivalent of ``manage.py startapp <name>`` without booting Django"""
+    render_template_dir(TEMPLATES_DIR / 'app_template', app_name, {
+        'app_name': app_name,
+        'camel_case_app_name': ''.join(part.capitalize() for part in app_name.split('_')),
+    }, manifest)
+
+PROFILES = ('development', 'production')
+
+PRODUCTION_ENV_CONTENT = """# Django Settings
+SECRET_KEY=your-secret-key-here
+DEBUG=False
+ALLOWED_HOSTS=localhost,127.0.0.1
+
+# Email Settings
+EMAIL_HOST_USER=your-email@gmail.com
+EMAIL_HOST_PASSWORD=your-app-password
+
+# Comma-separated keys for internal services using /auth/introspect/
+SERVICE_API_KEYS=
+
+# Database (PostgreSQL)
+DB_NAME=your_db_name
+DB_USER=your_db_user
+DB_PASSWORD=your_db_password
+DB_HOST=localhost
+DB_PORT=5432
+DB_POOL=True
+DB_POOL_MIN_SIZE=2
+DB_POOL_MAX_SIZE=10
+DB_CONN_MAX_AGE=60
+
+# Cache (leave empty to fall back to local memory)
+REDIS_URL=redis://localhost:6379/0
+
+# Application server
+# WEB_CONCURRENCY=
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+"""
+
+PRODUCTION_DATABASES = """DB_POOL = config('DB_POOL', default=True, cast=bool)
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DB_NAME'),
+        'USER': config('DB_USER'),
+        'PASSWORD': config('DB_PASSWORD'),
+        'HOST': config('DB_HOST', default='localhost'),
+        'PORT': config('DB_PORT', default='5432'),
+        # Django's connection pool requires CONN_MAX_AGE = 0
+        'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            },
+        } if DB_POOL else {},
+    }
+}
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+"""
+
+CACHED_TEMPLATE_LOADERS = """'APP_DIRS': False,
+        'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],"""
+
+GUNICORN_CONFIG = """import multiprocessing
+
+from decouple import config
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = config('BIND', default='0.0.0.0:8000')
+worker_class = config('GUNICORN_WORKER_CLASS', default='uvicorn.workers.UvicornWorker')
+
+# Async workers multiplex requests, so one per core is enough; sync workers
+# follow the usual (2 x cores) + 1 rule.
+if 'uvicorn' in worker_class:
+    wsgi_app = '{project_name}.asgi:application'
+    default_workers = cpu_count
+else:
+    wsgi_app = '{project_name}.wsgi:application'
+    default_workers = cpu_count * 2 + 1
+
+workers = config('WEB_CONCURRENCY', default=default_workers, cast=int)
+threads = config('GUNICORN_THREADS', default=1, cast=int)
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+max_requests = 1000
+max_requests_jitter = 100
+preload_app = True
+accesslog = '-'
+"""
+
+
+def apply_production_settings(settings_content):
+    """
+    Rewrite generated settings for the production profile
+
+    Args:
+        settings_content (str): settings.py content already patched for the app
+
+    Returns:
+        str: settings with PostgreSQL, shared cache and cached template loaders
+    """
+    settings_content = settings_content.replace(
+        "DEBUG = config('DEBUG', default=True, cast=bool)",
+        "DEBUG = config('DEBUG', default=False, cast=bool)"
+    )
+    if "from decouple import config, Csv" not in settings_content:
+        settings_content = settings_content.replace(
+            "from decouple import config",
+            "from decouple import config, Csv"
+        )
+    settings_content = re.sub(
+        r"ALLOWED_HOSTS = \[\]",
+        "ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost', cast=Csv())",
+        settings_content
+    )
+    if "DB_POOL = config" not in settings_content:
+        settings_content = re.sub(
+            r"DATABASES = \{.*?\n\}\n",
+            lambda match: PRODUCTION_DATABASES,
+            settings_content,
+            count=1,
+            flags=re.DOTALL
+        )
+    settings_content = re.sub(
+        r"'APP_DIRS': True,\s*'OPTIONS': \{",
+        lambda match: CACHED_TEMPLATE_LOADERS,
+        settings_content,
+        count=1
+    )
+    return settings_content
+
+
+def create_server_config(project_name, manifest=None):
+    content = GUNICORN_CONFIG.replace("{project_name}", project_name)
+    if manifest is None:
+        create_file("gunicorn.conf.py", content)
+    elif not manifest.write("gunicorn.conf.py", content):
+        return
+    print("Created gunicorn.conf.py sized from the CPU count")
+
+
+def load_spec(spec_path):
+    """
+    Load and validate a generation spec (TOML or JSON)
+
+    Args:
+        spec_path (str): Path to a .toml or .json spec file
+
+    Returns:
+        dict: Options understood by generate_project
+    """
+    path = Path(spec_path)
+    if path.suffix == '.toml':
+        if tomllib is None:
+            raise ValueError(f"{spec_path}: TOML specs need Python 3.11+, use JSON instead")
+        with open(path, 'rb') as f:
+            spec = tomllib.load(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+
+    for key in ('project_name', 'app_name'):
+        value = spec.get(key)
+        if not isinstance(value, str) or not value.isidentifier():
+            raise ValueError(f"{spec_path}: '{key}' must be a valid Python identifier")
+    if spec['project_name'] == spec['app_name']:
+        raise ValueError(f"{spec_path}: 'project_name' and 'app_name' must differ")
+
+    profile = spec.get('profile', 'development')
+    if profile not in PROFILES:
+        raise ValueError(f"{spec_path}: 'profile' must be one of {', '.join(PROFILES)}")
+
+    user_model = spec.get('user_model')
+    if user_model is not None and customize_user_model:
+        user_model = preferences_from_spec(user_model)
+
+    return {
+        'project_name': spec['project_name'],
+        'app_name': spec['app_name'],
+        'venv': spec.get('venv', 'venv'),
+        'profile': profile,
+        'user_model': user_model,
+        'directory': spec.get('directory'),
+    }
+
+def _generate_in_directory(options, directory):
+    """Batch worker: generate one project inside its own directory"""
+    directory.mkdir(parents=True, exist_ok=True)
+    os.chdir(directory)
+
+    # Keep each project's output (including subprocesses) in its own log
+    log = open('boiler.log', 'w')
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+    return generate_project(options) is not None
+
+def generate_batch(spec_paths, output_dir, jobs=None, overrides=None):
+    """
+    Generate many projects in parallel worker processes
+
+    Args:
+        spec_paths (list): Spec files to generate
+        output_dir (str): Directory that receives one sub-directory per project
+        jobs (int): Number of worker processes (default: CPU count)
+        overrides (dict): Options applied on top of every spec
+
+    Returns:
+        list: (spec_path, succeeded, directory) for every spec
+    """
+    output_path = Path(output_dir).resolve()
+    jobs_to_run = []
+    seen = set()
+    for spec_path in spec_paths:
+        options = {**load_spec(spec_path), **(overrides or {})}
+        directory = output_path / (options['directory'] or options['project_name'])
+        if directory in seen:
+            raise ValueError(f"{spec_path}: directory {directory} is used by another spec")
+        seen.add(directory)
+        jobs_to_run.append((spec_path, options, directory))
+
+    print(f"Generating {len(jobs_to_run)} project(s) into {output_path}...")
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            (spec_path, directory, executor.submit(_generate_in_directory, options, directory))
+            for spec_path, options, directory in jobs_to_run
+        ]
+        for spec_path, directory, future in futures:
+            try:
+                ok = future.result()
+            except BaseException as e:
+                print(f"  Error generating {spec_path}: {e}")
+                ok = False
+            print(f"  {'✅' if ok else '❌'} {spec_path} -> {directory} (log: {directory / 'boiler.log'})")
+            results.append((spec_path, ok, directory))
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Set up a Django REST project with JWT authentication")
+    parser.add_argument(
+        '--profile',
+        choices=PROFILES,
+        default='development',
+        help="Settings profile to generate (default: development)"
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        '--spec',
+        help="Generate without prompts from a TOML/JSON spec file"
+    )
+    source.add_argument(
+        '--batch',
+        nargs='+',
+        metavar='SPEC',
+        help="Generate several spec files in parallel, each in its own directory"
+    )
+    parser.add_argument(
+        '--output-dir',
+        default='.',
+        help="Parent directory for --batch projects (default: current directory)"
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help="Install only from the cached wheelhouse, never from the network"
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Skip the wheelhouse and venv snapshot cache"
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help="Worker processes for --batch (default: CPU count)"
+    )
+    return parser.parse_args(argv)
+
+def prompt_venv_name():
+    """Ask which virtual environment to use, offering any existing ones"""
     # Check for existing virtual environments
     existing_venvs = check_existing_venv()
     
@@ -173,64 +657,39 @@ def main():
     else:
         env_name = input("Enter virtual environment name (default: venv): ").strip() or 'venv'
 
-    # Determine activation command based on OS
-    if sys.platform == 'win32':
-        activate_cmd = f"{env_name}\\Scripts\\activate"
-        pip_cmd = f"{env_name}\\Scripts\\pip"
-        python_cmd = f"{env_name}\\Scripts\\python"
-    else:
-        activate_cmd = f"source {env_name}/bin/activate"
-        pip_cmd = f"{env_name}/bin/pip"
-        python_cmd = f"{env_name}/bin/python"
+    return env_name
 
-    # Create virtual environment if it doesn't exist
-    venv_path = Path(env_name)
-    if not venv_path.exists():
-        print(f"\nCreating virtual environment: {env_name}")
-        run_command(f"python -m venv {env_name}")
-    else:
-        print(f"\nUsing existing virtual environment: {env_name}")
-    
-    # Install packages from requirements.txt
-    print("\nInstalling packages from requirements.txt...")
-    if Path("requirements.txt").exists():
-        run_command(f"{pip_cmd} install -r requirements.txt")
-    else:
-        print("Warning: requirements.txt not found. Please ensure it exists with the required packages.")
-        return
-
-    # Create Django project
-    print(f"\nCreating Django project: {project_name}")
-    run_command(f"{python_cmd} -m django startproject {project_name} .")
+def collect_options(profile):
+    """
+    Gather every generation choice through prompts
 
-    # Create authentication app
-    print(f"\nCreating authentication app: {app_name}")
-    run_command(f"{python_cmd} manage.py startapp {app_name}")
+    Args:
+        profile (str): Settings profile selected on the command line
 
-    # Copy files from /authentification to the new app
-    print(f"\nCopying authentication files to {app_name} app...")
-    copy_authentication_files("authentification_folder", app_name, app_name)
+    Returns:
+        dict: Options in the same shape as a loaded spec file
+    """
+    project_name = input("Enter your Django project name: ").strip()
+    app_name = input("Enter authentication app name: ").strip()
+    env_name = prompt_venv_name()
 
-    # User model customization
+    user_model = None
     if customize_user_model:
         print(f"\n{'='*60}")
         print("USER MODEL CUSTOMIZATION")
         print(f"{'='*60}")
-        customize_models = input("Do you want to customize the User model? (y/n): ").lower().strip() == 'y'
-        
-        if customize_models:
-            success = customize_user_model(app_name)
-            if success:
-                print("✅ User model customized successfully!")
-            else:
-                print("❌ User model customization failed, using default model.")
-        else:
-            print("ℹ️  Using default User model configuration.")
-    else:
-        print("⚠️  User model customization not available. Using default configuration.")
+        if input("Do you want to customize the User model? (y/n): ").lower().strip() == 'y':
+            user_model = get_user_preferences()
+
+    return {
+        'project_name': project_name,
+        'app_name': app_name,
+        'venv': env_name,
+        'profile': profile,
+        'user_model': user_model,
+    }
 
-    # Create .env file
-    env_content = """# Django Settings
+DEVELOPMENT_ENV_CONTENT = """# Django Settings
 SECRET_KEY=your-secret-key-here
 DEBUG=True
 
@@ -238,6 +697,9 @@ DEBUG=True
 EMAIL_HOST_USER=your-email@gmail.com
 EMAIL_HOST_PASSWORD=your-app-password
 
+# Comma-separated keys for internal services using /auth/introspect/
+SERVICE_API_KEYS=
+
 # Database (if using PostgreSQL)
 # DB_NAME=your_db_name
 # DB_USER=your_db_user
@@ -245,23 +707,175 @@ EMAIL_HOST_PASSWORD=your-app-password
 # DB_HOST=localhost
 # DB_PORT=5432
 """
-    create_file(".env", env_content)
-    print("Created .env file with default settings")
 
-    # Update project settings
-    settings_path = Path(project_name) / 'settings.py'
-    
-    # Read current settings
-    with open(settings_path, 'r') as f:
-        settings_content = f.read()
-    
+def auth_settings_block(app_name):
+    """Settings appended to settings.py (kept in a generated section)"""
+    return f"""# Custom User Model
+AUTH_USER_MODEL = '{app_name}.User'
+
+# Custom Commands Module
+COMMANDS_MODULE = '{app_name}.management.commands'
+
+# REST Framework Settings
+REST_FRAMEWORK = {{
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        '{app_name}.authentication.LeanJWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+}}
+
+# Login and session lookups load only the auth columns of User
+AUTHENTICATION_BACKENDS = ['{app_name}.backends.LeanModelBackend']
+
+# Simple JWT Settings
+SIMPLE_JWT = {{
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'ROTATE_REFRESH_TOKENS': True,
+}}
+
+# Refresh token families (rotation with reuse detection)
+TOKEN_FAMILY_CACHE_ALIAS = 'default'
+TOKEN_FAMILY_USE_DATABASE = True
+
+# Read replicas for auth lookups (aliases from DATABASES)
+DATABASE_ROUTERS = ['{app_name}.sharding.ShardRouter', '{app_name}.routers.ReplicaRouter']
+AUTH_READ_REPLICAS = []
+AUTH_PRIMARY_PIN_SECONDS = 5
+# Count routed queries per alias for the routing metrics endpoint (adds a lock per query)
+AUTH_ROUTER_METRICS = DEBUG
+
+# Users sharded by email hash over these aliases (each one migrated with
+# `migrate --database=<alias>`). Enable before the first user is created:
+# user ids then carry the shard bucket. `manage.py rebalanceusers` copies
+# roles to every shard, moves buckets when shards are added and rewrites
+# the shard map file; users of the moving buckets are read-only (writes
+# raise BucketFrozen) until the new map is in place. `manage.py test
+# {app_name}.test_sharding` checks all of this once AUTH_SHARDS is set.
+AUTH_SHARDS = []
+AUTH_SHARD_MAP_FILE = BASE_DIR / 'shard-map.json'
+AUTH_SHARD_MAP_CHECK_SECONDS = 5
+
+# Offline breached password check (build the file with `manage.py buildbreachedpasswords`)
+AUTH_PASSWORD_VALIDATORS += [
+    {{
+        'NAME': '{app_name}.password_validation.BreachedPasswordValidator',
+        'OPTIONS': {{'path': BASE_DIR / 'breached-passwords.bin'}},
+    }},
+]
+
+# Blocked / disposable email domains (build with `manage.py buildemailblocklist`)
+EMAIL_DOMAIN_BLOCKLIST = BASE_DIR / 'email-domain-blocklist.bin'
+EMAIL_DOMAIN_BLOCKLIST_CHECK_SECONDS = 30
+
+# Single-use email tokens: a shared cache (e.g. Redis) when configured, else the UsedToken table
+ONE_TIME_TOKEN_CACHE_ALIAS = 'default'
+ONE_TIME_TOKEN_BACKEND = None  # 'cache', 'database' or None to pick from the cache backend
+
+# Repeated password reset requests for one email within this window send one email
+PASSWORD_RESET_COALESCE_SECONDS = 300
+
+# Retries of register / password reset carrying an Idempotency-Key header
+# replay the first response (use a shared cache across workers)
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+IDEMPOTENCY_TTL_SECONDS = 86400
+IDEMPOTENCY_WAIT_SECONDS = 10  # a retry waits this long for the first request to finish
+
+# Unverified accounts older than this are removed by `manage.py purgeunverified`
+PURGE_UNVERIFIED_AFTER_DAYS = 7
+
+# Audit log: events are buffered and bulk-inserted into monthly tables;
+# `manage.py pruneauditlog` drops whole months past the retention period
+AUDIT_LOG_ENABLED = True
+AUDIT_LOG_BATCH_SIZE = 500
+AUDIT_LOG_FLUSH_SECONDS = 2
+AUDIT_LOG_RETENTION_MONTHS = 12
+
+# WebSocket auth ({app_name}.websocket_auth.JWTWebSocketMiddleware): sockets are
+# closed when their access token expires, and rechecked for deactivated users
+# or revoked sessions this often
+WEBSOCKET_AUTH_REVALIDATE_SECONDS = 60
+WEBSOCKET_AUTH_TICK_SECONDS = 1
+
+# Internal services calling /auth/introspect/ (send as X-Api-Key)
+SERVICE_API_KEYS = [key for key in config('SERVICE_API_KEYS', default='').split(',') if key]
+INTROSPECTION_MAX_TOKENS = 100
+
+# Worker cold start budget, checked by `manage.py coldstart`. The app's
+# test_cold_start.py always checks deferred imports and the app's own import
+# time; the full time-to-first-request check runs with COLD_START_TESTS=1
+# (e.g. on a dedicated CI runner: wall-clock budgets are noisy on shared machines)
+COLD_START_BUDGET_MS = 1000
+
+# Digest emails (`manage.py senddigests`): sent at this local hour, weekly ones on this weekday (0 = Monday)
+DIGEST_SEND_HOUR = 8
+DIGEST_WEEKLY_DAY = 0
+DIGEST_DEFAULT_FREQUENCY = None  # used when communication_preferences has no digest_frequency
+DIGEST_MESSAGE_BUILDER = None  # dotted path to a callable(profile, connection) returning an EmailMessage
+
+# Default User Preferences
+DEFAULT_USER_PREFERENCES = {{
+    "theme": "light",
+    "notifications": {{"email": True, "push": True}},
+}}
+
+# Email Settings
+EMAIL_BACKEND = '{app_name}.mail.ResilientEmailBackend'
+EMAIL_HOST = 'smtp.gmail.com'
+EMAIL_PORT = 587
+EMAIL_USE_TLS = True
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# SMTP waits are bounded; after repeated failures sends fail fast for a
+# cool-down period, then one probe is let through (state at /auth/mail-metrics/)
+EMAIL_CONNECT_TIMEOUT = 5
+EMAIL_TIMEOUT = 10
+EMAIL_CIRCUIT_CACHE_ALIAS = 'default'
+EMAIL_CIRCUIT_FAILURE_THRESHOLD = 5
+EMAIL_CIRCUIT_RESET_SECONDS = 60
+
+# CORS Settings
+CORS_ALLOWED_ORIGINS = [
+    "http://localhost:3000",
+    "http://127.0.0.1:3000",
+]
+
+CORS_ALLOW_CREDENTIALS = True
+
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = [*default_headers, 'idempotency-key']
+"""
+
+def patch_settings(settings_content, app_name, production=False):
+    """
+    Patch a settings.py for the auth app
+
+    Every step is idempotent, so patching an already generated settings.py
+    only changes what the current options change.
+
+    Args:
+        settings_content (str): Current settings.py content
+        app_name (str): Authentication app name
+        production (bool): Apply the production profile
+
+    Returns:
+        str: Patched settings
+    """
     # Add imports at the top
     imports_to_add = """from datetime import timedelta
 from decouple import config
 """
     
     # Insert imports after existing imports
-    if "from pathlib import Path" in settings_content:
+    if "from decouple import config" in settings_content:
+        pass
+    elif "from pathlib import Path" in settings_content:
         settings_content = settings_content.replace(
             "from pathlib import Path",
             f"from pathlib import Path\n{imports_to_add}"
@@ -284,7 +898,7 @@ from decouple import config
     )
 
     # Add app to INSTALLED_APPS
-    if "INSTALLED_APPS = [" in settings_content:
+    if "INSTALLED_APPS = [" in settings_content and f"    '{app_name}',\n" not in settings_content:
         settings_content = settings_content.replace(
             "INSTALLED_APPS = [",
             f"""INSTALLED_APPS = [
@@ -295,74 +909,132 @@ from decouple import config
         )
 
     # Add CORS middleware
-    if "MIDDLEWARE = [" in settings_content:
+    if "MIDDLEWARE = [" in settings_content and "corsheaders.middleware.CorsMiddleware" not in settings_content:
         settings_content = settings_content.replace(
             "MIDDLEWARE = [",
-            """MIDDLEWARE = [
-    'corsheaders.middleware.CorsMiddleware',"""
+            f"""MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    '{app_name}.middleware.PrimaryStickinessMiddleware',"""
         )
 
     # Add REST Framework and JWT settings
-    rest_framework_settings = f"""
+    if "# Custom User Model" in settings_content and "boiler:auth" not in settings_content:
+        print("Warning: settings.py has an unmarked auth settings block from an older run; leaving it as is")
+    else:
+        settings_content = replace_section(settings_content, 'auth', auth_settings_block(app_name))
 
-# Custom User Model
-AUTH_USER_MODEL = '{app_name}.User'
+    if production:
+        settings_content = apply_production_settings(settings_content)
+    return settings_content
 
-# Custom Commands Module
-COMMANDS_MODULE = '{app_name}.management.commands'
+def generate_project(options):
+    """
+    Generate a project in the current directory without prompting
 
-# REST Framework Settings
-REST_FRAMEWORK = {{
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
-    ],
-    'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.IsAuthenticated',
-    ],
-}}
+    The steps run as a graph of phases: phases that don't depend on each
+    other (rendering and copying files, customizing the user model) run
+    while the virtualenv installs, Django commands run in one booted
+    process, and a per-phase timing report is printed at the end.
 
-# Simple JWT Settings
-SIMPLE_JWT = {{
-    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
-    'AUTH_HEADER_TYPES': ('Bearer',),
-}}
+    Re-running against an existing project only rewrites outputs whose
+    content changed (tracked in .boiler-manifest.json), and skips the
+    package install and migrations when nothing they depend on changed.
 
-# Default User Preferences
-DEFAULT_USER_PREFERENCES = {{
-    "theme": "light",
-    "notifications": {{"email": True, "push": True}},
-}}
+    Args:
+        options (dict): Validated options (see load_spec)
 
-# Email Settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
-EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
-EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
-DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+    Returns:
+        str: Path to the project's python executable, or None on failure
+    """
+    project_name = options['project_name']
+    app_name = options['app_name']
+    env_name = options['venv']
+    production = options['profile'] == 'production'
+    user_model = options.get('user_model')
+    manifest = GenerationManifest('.')
+    graph = PhaseGraph()
 
-# CORS Settings
-CORS_ALLOWED_ORIGINS = [
-    "http://localhost:3000",
-    "http://127.0.0.1:3000",
-]
+    python_cmd = venv_python(env_name)
 
-CORS_ALLOW_CREDENTIALS = True
-"""
+    requirements_file = BASE_DIR / ("requirements-production.txt" if production else "requirements.txt")
+    if not requirements_file.exists():
+        print(f"Warning: {requirements_file.name} not found. Please ensure it exists with the required packages.")
+        return None
+    requirements_key = requirements_hash(requirements_file)
+
+    def create_virtualenv():
+        # Create the virtual environment and install packages (cached when possible)
+        if Path(env_name).exists() and manifest.values.get('requirements') == requirements_key:
+            print(f"\nRequirements unchanged, reusing virtual environment: {env_name}")
+            return True
+        if not prepare_virtualenv(
+            env_name,
+            requirements_file,
+            offline=options.get('offline', False),
+            use_cache=options.get('use_cache', True)
+        ):
+            return False
+        manifest.values['requirements'] = requirements_key
+        return True
+
+    def create_project():
+        # Create Django project (existing skeleton files are kept)
+        print(f"\nCreating Django project: {project_name}")
+        render_project(project_name, manifest)
+
+    def create_app():
+        print(f"\nCreating authentication app: {app_name}")
+        render_app(app_name, manifest)
+
+    def copy_app_files():
+        print(f"\nCopying authentication files to {app_name} app...")
+        copy_authentication_files(
+            BASE_DIR / "authentification_folder",
+            app_name,
+            app_name,
+            manifest=manifest,
+            # A customized models.py is generated separately; don't copy the default over it
+            exclude=('models.py',) if user_model is not None and customize_user_model else ()
+        )
+
+    def customize_models():
+        # The initial migration is rendered from the model spec, unless a previous
+        # run already migrated the database (then changes need a new migration)
+        if user_model is None:
+            print("ℹ️  Using default User model configuration.")
+            return None
+        if not customize_user_model:
+            print("⚠️  User model customization not available. Using default configuration.")
+            return None
+        initial_migration = not manifest.values.get('migrated')
+        success = customize_user_model(app_name, user_model, manifest=manifest, initial_migration=initial_migration)
+        if success:
+            print("✅ User model customized successfully!")
+            # Truthy result: the initial migration was pre-generated
+            return initial_migration or None
+        print("❌ User model customization failed, using default model.")
+        copy_authentication_files(BASE_DIR / "authentification_folder", app_name, app_name, manifest=manifest)
+        return None
 
-    # Add settings to the end of the file
-    settings_content += rest_framework_settings
+    def create_env_file():
+        # Never overwrite real credentials
+        env_content = PRODUCTION_ENV_CONTENT if production else DEVELOPMENT_ENV_CONTENT
+        if manifest.write(".env", env_content, overwrite=False):
+            print("Created .env file with default settings")
 
-    # Write updated settings
-    create_file(settings_path, settings_content)
-    print("Updated settings.py with authentication and email configuration")
+    def update_settings():
+        settings_path = Path(project_name) / 'settings.py'
+        with open(settings_path, 'r') as f:
+            settings_content = f.read()
+        if manifest.write(settings_path, patch_settings(settings_content, app_name, production)):
+            print("Updated settings.py with authentication and email configuration")
+        if production:
+            create_server_config(project_name, manifest)
 
-    # Update project URLs to include app URLs
-    project_urls_path = Path(project_name) / 'urls.py'
-    project_urls_content = f"""from django.contrib import admin
+    def update_urls():
+        # Update project URLs to include app URLs
+        project_urls_path = Path(project_name) / 'urls.py'
+        project_urls_content = f"""from django.contrib import admin
 from django.urls import path, include
 
 path_v1 = 'api/v1/'
@@ -372,16 +1044,67 @@ urlpatterns = [
     path(f'{{path_v1}}/', include('{app_name}.urls')),
 ]
 """
-    create_file(project_urls_path, project_urls_content)
-    print("Updated project URLs")
+        if manifest.write(project_urls_path, project_urls_content):
+            print("Updated project URLs")
 
-    # Run migrations
-    print("\nMaking migrations...")
-    run_command(f"{python_cmd} manage.py makemigrations")
-    
-    print("Running migrations...")
-    run_command(f"{python_cmd} manage.py migrate")
+    def run_migrations():
+        manifest.report()
+
+        # Migrations only need to run when the app or project changed (or never finished)
+        if not manifest.changed(app_name, project_name) and manifest.values.get('migrated'):
+            print("\nNo app or settings changes, skipping migrations")
+            return None
+
+        manifest.values['migrated'] = False
+        manifest.save()
+
+        commands = []
+        if graph.results['models']:
+            print(f"\nUsing the initial migration generated for {app_name} (checked by {app_name}/test_migrations.py)")
+        else:
+            print("\nMaking migrations...")
+            commands.append(('makemigrations', []))
+        if production:
+            # The PostgreSQL credentials in .env are placeholders until filled in
+            print("Skipping migrate for the production profile: fill in the DB_* keys in .env, then run:")
+            print(f"   {python_cmd} manage.py migrate")
+        else:
+            print("Running migrations...")
+            commands.append(('migrate', []))
+        if not commands:
+            return None
+
+        timings = run_django_commands(python_cmd, f"{project_name}.settings", commands)
+        if timings is None:
+            return False
+        for step, seconds in timings:
+            graph.record('migrations', step, seconds)
+        manifest.values['migrated'] = not production
 
+    graph.add('virtualenv', create_virtualenv)
+    graph.add('project', create_project)
+    graph.add('app', create_app)
+    graph.add('copy', copy_app_files, requires=('app',))
+    graph.add('models', customize_models, requires=('copy',))
+    graph.add('env', create_env_file)
+    graph.add('settings', update_settings, requires=('project',))
+    graph.add('urls', update_urls, requires=('project',))
+    graph.add('migrations', run_migrations, requires=('virtualenv', 'models', 'env', 'settings', 'urls'))
+
+    try:
+        succeeded = graph.run()
+    finally:
+        manifest.save()
+    graph.report()
+    if not succeeded:
+        return None
+
+    if production:
+        print(f"\nStart the application server with:")
+        print(f"   {env_name}/bin/gunicorn -c gunicorn.conf.py")
+    return python_cmd
+
+def finish_interactive_setup(project_name, app_name, env_name, python_cmd):
     # Create superuser option
     create_superuser = input("\nCreate superuser? (y/n): ").lower().strip() == 'y'
     if create_superuser:
@@ -412,5 +1135,29 @@ urlpatterns = [
         print("\nAuthentication endpoints will be available at:")
         print("  - /api/v1/ (based on your app's URL configuration)")
 
+def main():
+    args = parse_args()
+    cache_options = {'offline': args.offline, 'use_cache': not args.no_cache}
+
+    if args.batch:
+        results = generate_batch(args.batch, args.output_dir, args.jobs, cache_options)
+        sys.exit(0 if all(ok for _, ok, _ in results) else 1)
+
+    if args.spec:
+        options = {**load_spec(args.spec), **cache_options}
+        if options['directory']:
+            Path(options['directory']).mkdir(parents=True, exist_ok=True)
+            os.chdir(options['directory'])
+        if generate_project(options) is None:
+            sys.exit(1)
+        print(f"\nGenerated {options['project_name']} from {args.spec}")
+        return
+
+    options = {**collect_options(args.profile), **cache_options}
+    python_cmd = generate_project(options)
+    if python_cmd is None or options['profile'] == 'production':
+        return
+    finish_interactive_setup(options['project_name'], options['app_name'], options['venv'], python_cmd)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+MANIFEST_NAME = '.boiler-manifest.json'
+SECTION_START = '# >>> boiler:{name} (generated - edits inside this block are replaced on re-run)'
+SECTION_END = '# <<< boiler:{name}'
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def replace_section(content, name, body):
+    """
+    Put ``body`` inside the named generated section of ``content``
+
+    The section is appended on first use; afterwards only the text between
+    its markers is replaced, so the rest of the file is left alone.
+    """
+    start_marker = SECTION_START.format(name=name)
+    end_marker = SECTION_END.format(name=name)
+    block = f"{start_marker}\n{body.strip(chr(10))}\n{end_marker}\n"
+
+    start = content.find(start_marker)
+    end = content.find(end_marker, start)
+    if start == -1 or end == -1:
+        return content.rstrip('\n') + "\n\n\n" + block
+    end = content.find('\n', end)
+    end = len(content) if end == -1 else end + 1
+    return content[:start] + block + content[end:]
+
+
+class GenerationManifest:
+    """
+    Records a content hash for every file the generator emits
+
+    On re-runs only outputs whose content actually changed are written, so
+    unchanged files keep their mtime (no bytecode or autoreload churn), and
+    the manifest tells which phases (install, migrations) can be skipped.
+    """
+
+    def __init__(self, root='.'):
+        self.root = Path(root).resolve()
+        self.path = self.root / MANIFEST_NAME
+        data = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                print(f"Warning: ignoring unreadable {MANIFEST_NAME}")
+        self.files = data.get('files', {})
+        self.values = data.get('values', {})
+        self.changes = {'added': [], 'updated': [], 'unchanged': []}
+        # Phases of one run may write concurrently
+        self._lock = threading.Lock()
+
+    @property
+    def is_new(self):
+        return not self.files
+
+    def _key(self, path):
+        path = Path(path)
+        if not path.is_absolute():
+            path = Path.cwd() / path
+        return path.resolve().relative_to(self.root).as_posix()
+
+    def _remember(self, key, target, digest):
+        stat = target.stat()
+        self.files[key] = {'sha256': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _unchanged_on_disk(self, key, target, digest):
+        """Cheap check first (recorded stat), full comparison only when needed"""
+        recorded = self.files.get(key)
+        stat = target.stat()
+        if recorded and recorded['size'] == stat.st_size and recorded['mtime_ns'] == stat.st_mtime_ns:
+            return recorded['sha256'] == digest, True
+        current = content_hash(target.read_bytes())
+        edited = recorded is not None and recorded['sha256'] != current
+        return current == digest, not edited
+
+    def write(self, path, content, overwrite=True):
+        """
+        Write ``content`` to ``path`` unless the file already holds it
+
+        Args:
+            path (str): File to write
+            content (str or bytes): New content
+            overwrite (bool): When False, an existing file is always kept
+
+        Returns:
+            bool: True if the file was written
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = content_hash(data)
+        target = Path(path)
+        key = self._key(target)
+
+        if target.exists():
+            if not overwrite:
+                self.changes['unchanged'].append(key)
+                return False
+            unchanged, pristine = self._unchanged_on_disk(key, target, digest)
+            if unchanged:
+                with self._lock:
+                    self._remember(key, target, digest)
+                    self.changes['unchanged'].append(key)
+                return False
+            if not pristine:
+                print(f"Warning: overwriting local edits in {key}")
+            status = 'updated'
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            status = 'added'
+
+        with open(target, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            self._remember(key, target, digest)
+            self.changes[status].append(key)
+        return True
+
+    def record(self, path, digest, written):
+        """Record a file written by someone else (e.g. the import rewriter)"""
+        target = Path(path)
+        key = self._key(target)
+        with self._lock:
+            if written:
+                self.changes['updated' if key in self.files else 'added'].append(key)
+            else:
+                self.changes['unchanged'].append(key)
+            self._remember(key, target, digest)
+
+    def changed(self, *prefixes):
+        """Whether any file under the given directories was added or updated in this run"""
+        touched = self.changes['added'] + self.changes['updated']
+        if not prefixes:
+            return bool(touched)
+        return any(key == prefix or key.startswith(prefix.rstrip('/') + '/') for key in touched for prefix in prefixes)
+
+    def save(self):
+        with self._lock:
+            data = {'version': 1, 'files': dict(self.files), 'values': dict(self.values)}
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(data, indent=2, sort_keys=True), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        added, updated, unchanged = (self.changes[k] for k in ('added', 'updated', 'unchanged'))
+        print(f"\nGeneration summary: {len(added)} added, {len(updated)} updated, {len(unchanged)} unchanged")
+        for key in added:
+            print(f"  + {key}")
+        for key in updated:
+            print(f"  ~ {key}")
@@ -0,0 +1,284 @@
+import argparse
+import ast
+import difflib
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Below this many Python files, worker processes cost more than they save
+PARALLEL_THRESHOLD = 200
+
+# From the ``from`` keyword to the first character of the module path
+_FROM_PREFIX = re.compile(r'from(?:\s|\\\n|\.)*')
+_STATEMENT_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+
+def _matches(module, old_name):
+    return module == old_name or module.startswith(old_name + '.')
+
+
+def find_import_edits(source, old_name):
+    """
+    Locate the module names to rename in a source string
+
+    The source is parsed, and only the first component of module paths in
+    ``import`` and ``from`` statements is considered, so aliases, imported
+    names, strings and comments are never touched. Multi-line (parenthesised
+    or backslash-continued) statements are handled by the parser.
+
+    Returns:
+        list: (start, end) character offsets of every name to replace
+    """
+    if old_name not in source:
+        return []
+
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+    line_starts = [0]
+    for line in lines:
+        line_starts.append(line_starts[-1] + len(line))
+
+    def offset(lineno, col_offset):
+        # ast columns are UTF-8 byte offsets
+        line = lines[lineno - 1]
+        if not line.isascii():
+            col_offset = len(line.encode('utf-8')[:col_offset].decode('utf-8'))
+        return line_starts[lineno - 1] + col_offset
+
+    edits = []
+    # Imports are statements, so only statement bodies need to be visited
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for field in _STATEMENT_FIELDS:
+            for child in getattr(node, field, None) or ():
+                if isinstance(child, ast.Import):
+                    for alias in child.names:
+                        if _matches(alias.name, old_name):
+                            start = offset(alias.lineno, alias.col_offset)
+                            edits.append((start, start + len(old_name)))
+                elif isinstance(child, ast.ImportFrom):
+                    if child.module and _matches(child.module, old_name):
+                        start = _FROM_PREFIX.match(source, offset(child.lineno, child.col_offset)).end()
+                        edits.append((start, start + len(old_name)))
+                else:
+                    stack.append(child)
+    return sorted(edits)
+
+
+def rewrite_source(source, old_name, new_name):
+    """Return ``source`` with ``old_name`` renamed to ``new_name`` in import statements"""
+    edits = find_import_edits(source, old_name)
+    if not edits:
+        return source
+
+    pieces = []
+    position = 0
+    for start, end in edits:
+        pieces.append(source[position:start])
+        pieces.append(new_name)
+        position = end
+    pieces.append(source[position:])
+    return ''.join(pieces)
+
+
+def _write_if_changed(dest_file, data):
+    """Write ``data`` unless ``dest_file`` already holds exactly these bytes"""
+    try:
+        with open(dest_file, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(dest_file, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def _rewrite_one(job):
+    """Rewrite (or copy) a single file; runs in worker processes"""
+    source_file, dest_file, old_name, new_name, dry_run = job
+    result = {'path': dest_file, 'changed': False, 'written': False, 'diff': None, 'error': None, 'sha256': None}
+
+    with open(source_file, 'rb') as f:
+        data = f.read()
+    updated = data
+
+    if source_file.endswith('.py'):
+        try:
+            content = data.decode('utf-8')
+            rewritten = rewrite_source(content, old_name, new_name)
+        except (SyntaxError, ValueError, UnicodeDecodeError) as e:
+            # Leave files we cannot parse exactly as they were
+            result['error'] = str(e)
+        else:
+            if rewritten != content:
+                result['changed'] = True
+                updated = rewritten.encode('utf-8')
+                if dry_run:
+                    result['diff'] = ''.join(difflib.unified_diff(
+                        content.splitlines(keepends=True),
+                        rewritten.splitlines(keepends=True),
+                        fromfile=source_file,
+                        tofile=dest_file
+                    ))
+
+    if not dry_run:
+        result['written'] = _write_if_changed(dest_file, updated)
+        result['sha256'] = hashlib.sha256(updated).hexdigest()
+    return result
+
+
+def rewrite_tree(source_dir, dest_dir, old_name, new_name, jobs=None, dry_run=False, exclude=()):
+    """
+    Copy a tree, rewriting imports of ``old_name`` to ``new_name`` on the way
+
+    Each Python file is read once and written at most once: destinations
+    that already hold the same bytes are left untouched. Large trees are
+    processed by worker processes.
+
+    Args:
+        source_dir (str): Directory to copy from
+        dest_dir (str): Directory to copy into (may be the same as source_dir)
+        old_name (str): Module name to replace
+        new_name (str): Module name to use instead
+        jobs (int): Worker processes (default: CPU count, only for large trees)
+        dry_run (bool): Only compute diffs, write nothing
+        exclude (tuple): Paths relative to source_dir to leave out
+
+    Returns:
+        list: one dict per file with ``path``, ``changed`` (imports rewritten),
+        ``written``, ``diff`` (dry run only), ``error`` and ``sha256``
+    """
+    source_dir = os.fspath(source_dir)
+    dest_dir = os.fspath(dest_dir)
+    excluded = {os.path.normpath(path) for path in exclude}
+
+    work = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = [d for d in dirs if d != '__pycache__']
+        target_root = os.path.normpath(os.path.join(dest_dir, os.path.relpath(root, source_dir)))
+        if not dry_run:
+            os.makedirs(target_root, exist_ok=True)
+        for name in sorted(files):
+            if os.path.normpath(os.path.join(os.path.relpath(root, source_dir), name)) in excluded:
+                continue
+            work.append((os.path.join(root, name), os.path.join(target_root, name), old_name, new_name, dry_run))
+
+    python_files = sum(1 for job in work if job[0].endswith('.py'))
+    if python_files >= PARALLEL_THRESHOLD and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(_rewrite_one, work, chunksize=64))
+    return [_rewrite_one(job) for job in work]
+
+
+def _legacy_rewrite(app_dir, old_name, new_name):
+    """The former copy-then-regex approach, kept for benchmark comparison"""
+    patterns = [
+        (rf'from \.{re.escape(old_name)}', f'from .{new_name}'),
+        (rf'from {re.escape(old_name)}(?=\s)', f'from {new_name}'),
+        (rf'import {re.escape(old_name)}(?=\.)', f'import {new_name}'),
+        (rf'from {re.escape(old_name)}\.', f'from {new_name}.'),
+    ]
+    for py_file in Path(app_dir).glob("**/*.py"):
+        with open(py_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        original = content
+        for pattern, replacement in patterns:
+            content = re.sub(pattern, replacement, content)
+        if content != original:
+            with open(py_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+
+
+SYNTHETIC_MODULE = '''import os
+import {old}.models
+import {old}.utils as auth_utils, json
+from {old}.models import User
+from {old}.serializers import (
+    RegisterSerializer,
+    LoginSerializer,
+)
+from .{old} import helpers
+from django.conf import settings
+
+LABEL = "{old}.User"  # a string, must not change
+
+
+def handler_{index}(request):
+    payload = json.dumps({{"module": {index}}})
+    if settings.DEBUG:
+        import {old}.signals
+    return User.objects.filter(pk={index}), payload
+'''
+
+
+def benchmark(modules=2000, jobs=None, old_name='authentification', new_name='accounts'):
+    """
+    Time the single-pass rewrite against the legacy copy + regex passes
+    on a synthetic app with ``modules`` Python modules
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'source'
+        for index in range(modules):
+            package = source / f'pkg{index // 100}'
+            package.mkdir(parents=True, exist_ok=True)
+            (package / f'module_{index}.py').write_text(
+                SYNTHETIC_MODULE.format(old=old_name, index=index), encoding='utf-8'
+            )
+
+        started = time.perf_counter()
+        shutil.copytree(source, Path(tmp) / 'legacy')
+        _legacy_rewrite(Path(tmp) / 'legacy', old_name, new_name)
+        legacy = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = rewrite_tree(source, Path(tmp) / 'single_pass', old_name, new_name, jobs=jobs)
+        single_pass = time.perf_counter() - started
+
+    changed = sum(1 for result in results if result['changed'])
+    print(f"Synthetic app: {modules} modules, {changed} rewritten")
+    print(f"  copy + regex passes : {legacy * 1000:8.1f} ms")
+    print(f"  single-pass rewrite : {single_pass * 1000:8.1f} ms")
+    return legacy, single_pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy a Django app while renaming its imports")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    copy_parser = subparsers.add_parser('copy', help="Copy SOURCE to DEST rewriting imports")
+    copy_parser.add_argument('source')
+    copy_parser.add_argument('dest')
+    copy_parser.add_argument('--old', default='authentification', help="Module name to replace")
+    copy_parser.add_argument('--new', required=True, help="New module name")
+    copy_parser.add_argument('--jobs', type=int, default=None)
+    copy_parser.add_argument('--dry-run', action='store_true', help="Print a diff instead of writing")
+
+    bench_parser = subparsers.add_parser('bench', help="Benchmark on a synthetic app")
+    bench_parser.add_argument('--modules', type=int, default=2000)
+    bench_parser.add_argument('--jobs', type=int, default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == 'bench':
+        benchmark(args.modules, args.jobs)
+        return
+
+    results = rewrite_tree(args.source, args.dest, args.old, args.new, jobs=args.jobs, dry_run=args.dry_run)
+    for result in results:
+        if result['error']:
+            print(f"  Skipped {result['path']}: {result['error']}", file=sys.stderr)
+        elif result['diff']:
+            sys.stdout.write(result['diff'])
+        elif result['written']:
+            print(f"  Updated: {result['path']}")
+
+
+if __name__ == '__main__':
+    main()
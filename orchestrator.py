@@ -0,0 +1,149 @@
+import json
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Runs management commands one after another in a single booted Django process
+DJANGO_RUNNER = '''
+import importlib, json, os, sys, time
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', sys.argv[1])
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.management import call_command
+timings = [['django.setup', time.perf_counter() - started]]
+for name, args in json.loads(sys.argv[2]):
+    importlib.invalidate_caches()  # pick up migration files written by a previous command
+    started = time.perf_counter()
+    call_command(name, *args)
+    timings.append([name, time.perf_counter() - started])
+with open(sys.argv[3], 'w') as f:
+    json.dump(timings, f)
+'''
+
+
+def run_django_commands(python_cmd, settings_module, commands):
+    """
+    Run management commands through ``call_command`` in one Django process
+
+    Django is booted once for all commands instead of once per
+    ``manage.py`` invocation.
+
+    Args:
+        python_cmd (str): Python executable of the project's virtualenv
+        settings_module (str): Value for DJANGO_SETTINGS_MODULE
+        commands (list): (command name, [arguments]) pairs, run in order
+
+    Returns:
+        list: (step, seconds) pairs, including the django.setup() boot, or
+        None if a command failed
+    """
+    fd, timings_path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        result = subprocess.run(
+            [python_cmd, '-c', DJANGO_RUNNER, settings_module, json.dumps(commands), timings_path]
+        )
+        if result.returncode != 0:
+            print(f"Error running {', '.join(name for name, _ in commands)} (exit code {result.returncode})")
+            return None
+        with open(timings_path) as f:
+            return [tuple(timing) for timing in json.load(f)]
+    finally:
+        os.unlink(timings_path)
+
+
+class PhaseGraph:
+    """
+    Runs named phases as soon as the phases they require have finished
+
+    Independent phases run concurrently in threads (the slow ones wait on
+    subprocesses or disk), and each phase is timed. When a phase fails, the
+    phases depending on it are skipped.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.phases = {}
+        self.results = {}
+        self.status = {}
+        self.timings = {}
+        self.steps = {}
+
+    def add(self, name, func, requires=()):
+        unknown = [required for required in requires if required not in self.phases]
+        if unknown:
+            raise ValueError(f"Phase {name} requires unknown phases: {', '.join(unknown)}")
+        self.phases[name] = (func, tuple(requires))
+
+    def record(self, phase, step, seconds):
+        """Record the timing of a step inside a phase (shown under it in the report)"""
+        self.steps.setdefault(phase, []).append((step, seconds))
+
+    def _run_phase(self, name, started):
+        func = self.phases[name][0]
+        begin = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.timings[name] = (begin - started, time.perf_counter() - begin)
+
+    def _skip_dependents(self, failed):
+        for name, (_, requires) in self.phases.items():
+            if failed in requires and name not in self.status:
+                self.status[name] = 'skipped'
+                self._skip_dependents(name)
+
+    def run(self):
+        """
+        Run every phase
+
+        Returns:
+            bool: True if all phases succeeded
+        """
+        started = time.perf_counter()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                for name, (_, requires) in self.phases.items():
+                    if name in self.status or name in running.values():
+                        continue
+                    if all(self.status.get(required) == 'ok' for required in requires):
+                        running[executor.submit(self._run_phase, name, started)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except BaseException as e:
+                        # run_command() exits on errors; contain that to the phase
+                        print(f"Phase {name} failed: {e!r}")
+                        result = False
+                    self.results[name] = result
+                    if result is False:
+                        self.status[name] = 'failed'
+                        self._skip_dependents(name)
+                    else:
+                        self.status[name] = 'ok'
+        self.wall_time = time.perf_counter() - started
+        return all(status == 'ok' for status in self.status.values())
+
+    def report(self):
+        print("\nPhase timings:")
+        print(f"  {'phase':<24}{'status':<9}{'start':>8}{'duration':>10}")
+        order = sorted(self.phases, key=lambda name: self.timings.get(name, (float('inf'), 0))[0])
+        for name in order:
+            start, duration = self.timings.get(name, (None, None))
+            if start is None:
+                print(f"  {name:<24}{self.status.get(name, 'skipped'):<9}{'-':>8}{'-':>10}")
+                continue
+            print(f"  {name:<24}{self.status[name]:<9}{start:>7.2f}s{duration:>9.2f}s")
+            for step, seconds in self.steps.get(name, []):
+                print(f"    {step:<31}{seconds:>18.2f}s")
+        busy = sum(duration for _, duration in self.timings.values())
+        print(f"  total {self.wall_time:.2f}s wall, {busy:.2f}s of phase time")
@@ -0,0 +1,76 @@
+"""
+End-to-end checks of boiler.py generation
+
+Generating a project creates a virtualenv and installs the requirements, so
+these tests only run with BOILER_GENERATION_TESTS=1:
+
+    BOILER_GENERATION_TESTS=1 python -m unittest discover tests
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Three SQLite shards next to the default database (the test runner creates
+# an in-memory test database for each)
+SHARDED_SETTINGS = """from .settings import *  # noqa
+
+DATABASES.update({
+    alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / f'{alias}.sqlite3'}
+    for alias in ('shard_a', 'shard_b', 'shard_c')
+})
+AUTH_SHARDS = ['shard_a', 'shard_b', 'shard_c']
+AUTH_SHARD_MAP_CHECK_SECONDS = 0
+"""
+
+
+@unittest.skipUnless(os.environ.get('BOILER_GENERATION_TESTS'), "set BOILER_GENERATION_TESTS=1 to generate projects")
+class GeneratedProjectTests(unittest.TestCase):
+
+    def generate(self, directory, spec):
+        spec_path = Path(directory) / 'spec.json'
+        spec_path.write_text(json.dumps(spec))
+        result = subprocess.run(
+            [sys.executable, str(BASE_DIR / 'boiler.py'), '--spec', str(spec_path)],
+            cwd=directory, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+    def run_project_tests(self, directory, spec, *args, label=None):
+        python_cmd = Path(directory) / spec['venv'] / ('Scripts' if sys.platform == 'win32' else 'bin') / 'python'
+        result = subprocess.run(
+            [str(python_cmd), 'manage.py', 'test', label or spec['app_name'], *args],
+            cwd=directory, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        return result.stdout + result.stderr
+
+    def test_without_roles(self):
+        spec = {
+            'project_name': 'workspace',
+            'app_name': 'accounts',
+            'venv': 'venv',
+            'user_model': {'roles': False, 'include_preferences': False, 'profile_fields': []},
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            self.generate(directory, spec)
+            self.run_project_tests(directory, spec)
+
+    def test_sharded_users(self):
+        spec = {'project_name': 'workspace', 'app_name': 'accounts', 'venv': 'venv'}
+        with tempfile.TemporaryDirectory() as directory:
+            self.generate(directory, spec)
+            (Path(directory) / 'workspace' / 'sharded_settings.py').write_text(SHARDED_SETTINGS)
+            output = self.run_project_tests(
+                directory, spec, '--settings=workspace.sharded_settings', label='accounts.test_sharding'
+            )
+            self.assertNotIn('skipped', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -56,13 +56,87 @@ def get_user_preferences():
     
     return preferences
 
-def generate_user_model(preferences):
+PROFILE_FIELDS = ['job_title', 'social_links', 'communication_preferences', 'security_settings']
+
+def preferences_from_spec(user_model):
     """
-    Generate customized user model based on preferences
+    Build the preferences dict from the [user_model] section of a spec file
+    
+    ``roles`` is a list of extra role names, or false to drop the role system.
     """
+    preferences = {}
     
-    # Base imports
-    model_content = """from django.db import models
+    roles = user_model.get('roles', [])
+    if roles is False:
+        preferences['use_roles'] = False
+    else:
+        preferences['custom_roles'] = [str(role).strip() for role in roles if str(role).strip()]
+    
+    preferences['include_preferences'] = bool(user_model.get('include_preferences', True))
+    
+    profile_fields = user_model.get('profile_fields', [])
+    unknown = set(profile_fields) - set(PROFILE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown profile fields: {', '.join(sorted(unknown))}")
+    for field in PROFILE_FIELDS:
+        preferences[field] = field in profile_fields
+    
+    return preferences
+
+class Expr:
+    """
+    Python source for a spec value
+
+    ``model`` is how the value is spelled in models.py; ``migration`` is how
+    the migration writer spells it (``{app_label}`` is filled in), and
+    ``imports`` are the import lines the migration then needs.
+    """
+    def __init__(self, model, migration=None, imports=()):
+        self.model = model
+        self.migration = model if migration is None else migration
+        self.imports = tuple(imports)
+
+
+NOW = Expr('tz.now', 'django.utils.timezone.now', ['import django.utils.timezone'])
+CASCADE = Expr('models.CASCADE', 'django.db.models.deletion.CASCADE', ['import django.db.models.deletion'])
+SET_NULL = Expr('models.SET_NULL', 'django.db.models.deletion.SET_NULL', ['import django.db.models.deletion'])
+AUTH_USER = Expr('User', 'settings.AUTH_USER_MODEL', ['from django.conf import settings'])
+
+# Latest django.contrib.auth migration; the M2M fields of PermissionsMixin point there
+AUTH_DEPENDENCY = ('auth', '0012_alter_user_first_name_max_length')
+
+# Fields User gets from AbstractBaseUser and PermissionsMixin (migration only)
+INHERITED_USER_FIELDS = [
+    ('password', 'models.CharField', {'max_length': 128, 'verbose_name': 'password'}),
+    ('last_login', 'models.DateTimeField', {'blank': True, 'null': True, 'verbose_name': 'last login'}),
+    ('is_superuser', 'models.BooleanField', {
+        'default': False,
+        'help_text': 'Designates that this user has all permissions without explicitly assigning them.',
+        'verbose_name': 'superuser status',
+    }),
+    ('groups', 'models.ManyToManyField', {
+        'blank': True,
+        'help_text': 'The groups this user belongs to. A user will get all permissions granted to each of their groups.',
+        'related_name': 'user_set',
+        'related_query_name': 'user',
+        'to': 'auth.group',
+        'verbose_name': 'groups',
+    }),
+    ('user_permissions', 'models.ManyToManyField', {
+        'blank': True,
+        'help_text': 'Specific permissions for this user.',
+        'related_name': 'user_set',
+        'related_query_name': 'user',
+        'to': 'auth.permission',
+        'verbose_name': 'user permissions',
+    }),
+]
+
+RELATED_FIELDS = ('models.ForeignKey', 'models.OneToOneField', 'models.ManyToManyField')
+
+
+def _manager_source(preferences):
+    manager_content = """from django.db import models
 from django.contrib.auth.models import BaseUserManager, PermissionsMixin, AbstractBaseUser
 import datetime
 from django.utils import timezone as tz
@@ -85,13 +159,13 @@ class UserManager(BaseUserManager):
     
     # Add preferences default if included
     if preferences.get('include_preferences', True):
-        model_content += """
+        manager_content += """
         extra_fields.setdefault('preferences', {
             'theme': 'dark',
             'notifications': {'email': True, 'push': False}
         })"""
     
-    model_content += """
+    manager_content += """
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
         extra_fields.setdefault('is_active', True)
@@ -105,83 +179,124 @@ class UserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
+class AuthUserManager(UserManager):
+    \"\"\"
+    Users as loaded on the authentication hot path (login, JWT, email tokens)
+
+    Only the columns authentication and the login response need are
+    selected; bio, avatar, preferences and the rest are deferred and load on
+    first access.
+    \"\"\"
+    auth_fields = (
+        'email', 'password', 'first_name', 'last_name', 'role', 'is_active',
+        'is_staff', 'is_superuser', 'is_deleted', 'email_verified', 'last_login',
+    )
+
+    def get_queryset(self):
+        names = {field.name for field in self.model._meta.concrete_fields}
+        return super().get_queryset().only(*(name for name in self.auth_fields if name in names))
 """
+    return manager_content
+
+def build_model_spec(preferences):
+    """
+    Build the in-memory model spec for the chosen preferences
+
+    Each model is a dict with ``name``, ``bases``, ``fields`` (name, field
+    class, kwargs), ``options`` (Meta, including ``indexes`` and
+    ``constraints``), and source-only parts: ``prelude`` (emitted before the
+    class), ``body`` (after the fields) and ``inherited`` (fields from
+    abstract bases that only the migration spells out).
+
+    Returns:
+        list: Models in dependency order
+    """
+    models_spec = []
+    use_roles = preferences.get('use_roles', True)
     
-    # Add Role classes if roles are used
-    if preferences.get('use_roles', True):
+    # Role classes if roles are used
+    if use_roles:
         # Start with default roles
-        roles = ['ADMIN = \'Admin\', \'Admin\'', 'USER = \'User\', \'User\'']
+        roles = [('ADMIN', 'Admin'), ('USER', 'User')]
         
         # Add custom roles
-        custom_roles = preferences.get('custom_roles', [])
-        for role in custom_roles:
-            role_upper = role.upper().replace(' ', '_')
-            roles.append(f"{role_upper} = '{role}', '{role}'")
+        for role in preferences.get('custom_roles', []):
+            roles.append((role.upper().replace(' ', '_'), role))
         
-        model_content += """class Role(models.TextChoices):
-    """ + '\n    '.join(roles) + """
-
-
-class RoleModel(models.Model):
-    name = models.CharField(max_length=20, choices=Role.choices, default=Role.USER)
-    description = models.TextField(blank=True, null=True)
-    created_at = models.DateTimeField(default=tz.now)
-    updated_at = models.DateTimeField(auto_now=True)
-    
-    def __str__(self):
-        return self.name
-
-
-"""
+        models_spec.append({
+            'name': 'RoleModel',
+            'bases': ['models.Model'],
+            'prelude': "class Role(models.TextChoices):\n    " + '\n    '.join(
+                f"{member} = {value!r}, {value!r}" for member, value in roles
+            ),
+            'fields': [
+                ('name', 'models.CharField', {
+                    'max_length': 20,
+                    'choices': Expr('Role.choices', repr([(value, value) for _, value in roles])),
+                    'default': Expr('Role.USER', "'User'"),
+                }),
+                ('description', 'models.TextField', {'blank': True, 'null': True}),
+                ('created_at', 'models.DateTimeField', {'default': NOW}),
+                ('updated_at', 'models.DateTimeField', {'auto_now': True}),
+            ],
+            'body': """    def __str__(self):
+        return self.name""",
+        })
     
     # User model
-    model_content += """class User(AbstractBaseUser, PermissionsMixin):
-    email = models.EmailField(unique=True)
-    first_name = models.CharField(max_length=30, blank=True)
-    last_name = models.CharField(max_length=30, blank=True)"""
-    
-    # Add role field if roles are used
-    if preferences.get('use_roles', True):
-        model_content += """
-    role = models.ForeignKey(
-        RoleModel,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        verbose_name="User Role"
-    )"""
-    
-    model_content += """
-    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
-    bio = models.TextField(max_length=500, blank=True)
-    is_active = models.BooleanField(default=True)
-    is_staff = models.BooleanField(default=False)
-    is_deleted = models.BooleanField(default=False)
-    email_verified = models.BooleanField(default=False)
-    time_zone = models.CharField(
-        max_length=50,
-        blank=True,
-        null=True,
-        default="UTC",
-        verbose_name="Timezone",
-        help_text="e.g., Ensures time-sensitive features align with user's local time."
-    )"""
-    
+    user_fields = [
+        ('email', 'models.EmailField', {'unique': True}),
+        ('first_name', 'models.CharField', {'max_length': 30, 'blank': True}),
+        ('last_name', 'models.CharField', {'max_length': 30, 'blank': True}),
+    ]
+    if use_roles:
+        user_fields.append(('role', 'models.ForeignKey', {
+            'to': Expr('RoleModel', "'{app_label}.rolemodel'"),
+            'on_delete': SET_NULL,
+            'null': True,
+            'blank': True,
+            'verbose_name': "User Role",
+        }))
+    user_fields += [
+        ('avatar', 'models.ImageField', {'upload_to': 'avatars/', 'null': True, 'blank': True}),
+        ('bio', 'models.TextField', {'max_length': 500, 'blank': True}),
+        ('is_active', 'models.BooleanField', {'default': True}),
+        ('is_staff', 'models.BooleanField', {'default': False}),
+        ('is_deleted', 'models.BooleanField', {'default': False}),
+        ('email_verified', 'models.BooleanField', {'default': False}),
+        ('time_zone', 'models.CharField', {
+            'max_length': 50,
+            'blank': True,
+            'null': True,
+            'default': "UTC",
+            'verbose_name': "Timezone",
+            'help_text': "e.g., Ensures time-sensitive features align with user's local time.",
+        }),
+    ]
     # Add preferences field if included
     if preferences.get('include_preferences', True):
-        model_content += """
-    preferences = models.JSONField(
-        blank=True,
-        null=True,
-        default=dict,
-        verbose_name="Preferences",
-        help_text="JSON key-value pairs for user-specific settings."
-    )"""
-    
-    model_content += """
-    date_joined = models.DateTimeField(default=tz.now)
-    
-    objects = UserManager()
+        user_fields.append(('preferences', 'models.JSONField', {
+            'blank': True,
+            'null': True,
+            'default': Expr('dict'),
+            'verbose_name': "Preferences",
+            'help_text': "JSON key-value pairs for user-specific settings.",
+        }))
+    user_fields.append(('date_joined', 'models.DateTimeField', {'default': NOW}))
+    
+    models_spec.append({
+        'name': 'User',
+        'bases': ['AbstractBaseUser', 'PermissionsMixin'],
+        'inherited': INHERITED_USER_FIELDS,
+        'fields': user_fields,
+        'options': {
+            'indexes': [
+                # Drives purge_unverified_users (purgeunverified command)
+                ('models.Index', {'fields': ['email_verified', 'date_joined'], 'name': 'user_unverified_joined_idx'}),
+            ],
+        },
+        'body': """    objects = UserManager()
+    auth_objects = AuthUserManager()
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -192,87 +307,316 @@ class RoleModel(models.Model):
         return f"{self.first_name or ''} {self.last_name or ''}".strip()
     
     def __str__(self):
-        return self.email
-
-
-"""
+        return self.email""",
+    })
     
     # UserProfile model
     profile_fields = []
     
     if preferences.get('job_title', False):
-        profile_fields.append("""    job_title = models.CharField(
-        max_length=100,
-        blank=True,
-        verbose_name="Job Title"
-    )""")
-    
-    profile_fields.append("""    phone_number = models.CharField(
-        max_length=20,
-        blank=True,
-        null=True,
-        verbose_name="Phone Number"
-    )""")
+        profile_fields.append(('job_title', 'models.CharField', {
+            'max_length': 100,
+            'blank': True,
+            'verbose_name': "Job Title",
+        }))
+    
+    profile_fields.append(('phone_number', 'models.CharField', {
+        'max_length': 20,
+        'blank': True,
+        'null': True,
+        'verbose_name': "Phone Number",
+    }))
     
     if preferences.get('social_links', False):
-        profile_fields.append("""    social_links = models.JSONField(
-        blank=True,
-        null=True,
-        default=list,
-        verbose_name="Social Media Links",
-        help_text="List of URLs: [{'name':'GitHub','url':'https://...'}, ...]"
-    )""")
+        profile_fields.append(('social_links', 'models.JSONField', {
+            'blank': True,
+            'null': True,
+            'default': Expr('list'),
+            'verbose_name': "Social Media Links",
+            'help_text': "List of URLs: [{'name':'GitHub','url':'https://...'}, ...]",
+        }))
     
     if preferences.get('communication_preferences', False):
-        profile_fields.append("""    communication_preferences = models.JSONField(
-        blank=True,
-        null=True,
-        default=dict,
-        verbose_name="Communication Preferences",
-        help_text="e.g., {'allow_team_mentions': true, 'digest_frequency': 'daily'}"
-    )""")
+        profile_fields.append(('communication_preferences', 'models.JSONField', {
+            'blank': True,
+            'null': True,
+            'default': Expr('dict'),
+            'verbose_name': "Communication Preferences",
+            'help_text': "e.g., {'allow_team_mentions': true, 'digest_frequency': 'daily'}",
+        }))
     
     if preferences.get('security_settings', False):
-        profile_fields.append("""    security_settings = models.JSONField(
-        blank=True,
-        null=True,
-        default=dict,
-        verbose_name="Security Settings",
-        help_text="e.g., {'2fa_enabled': true, 'login_alerts': true}"
-    )""")
-    
-    # Only add UserProfile if there are additional fields
-    if profile_fields:
-        model_content += """class UserProfile(models.Model):
-    user = models.OneToOneField(
-        User,
-        on_delete=models.CASCADE,
-        related_name="profile"
-    )
+        profile_fields.append(('security_settings', 'models.JSONField', {
+            'blank': True,
+            'null': True,
+            'default': Expr('dict'),
+            'verbose_name': "Security Settings",
+            'help_text': "e.g., {'2fa_enabled': true, 'login_alerts': true}",
+        }))
+    
+    # Maintained by the digest signals; drives the senddigests command
+    profile_fields.append(('next_digest_at', 'models.DateTimeField', {'null': True, 'blank': True, 'db_index': True}))
+    
+    models_spec.append({
+        'name': 'UserProfile',
+        'bases': ['models.Model'],
+        'fields': [
+            ('user', 'models.OneToOneField', {
+                'to': AUTH_USER,
+                'on_delete': CASCADE,
+                'related_name': "profile",
+            }),
+        ] + profile_fields,
+        'body': """    def __str__(self):
+        return f"{self.user.email}'s Profile\"""",
+    })
+    
+    # Refresh token families used by the rotating token refresh view
+    models_spec.append({
+        'name': 'TokenFamily',
+        'bases': ['models.Model'],
+        'fields': [
+            ('family', 'models.CharField', {'max_length': 32, 'primary_key': True}),
+            ('user', 'models.ForeignKey', {
+                'to': AUTH_USER,
+                'on_delete': CASCADE,
+                'related_name': "token_families",
+            }),
+            ('current_jti', 'models.CharField', {'max_length': 255}),
+            ('revoked', 'models.BooleanField', {'default': False}),
+            ('expires_at', 'models.DateTimeField', {'db_index': True}),
+        ],
+        'body': """    def __str__(self):
+        return f"{self.user_id}:{self.family}\"""",
+    })
+    
+    # Used email tokens (one-time token store fallback)
+    models_spec.append({
+        'name': 'UsedToken',
+        'bases': ['models.Model'],
+        'fields': [
+            ('jti', 'models.CharField', {'max_length': 64, 'primary_key': True}),
+            ('expires_at', 'models.DateTimeField', {'db_index': True}),
+        ],
+        'body': """    def __str__(self):
+        return self.jti""",
+    })
+    
+    return models_spec
+
+def _value_source(value, migration=False, app_label=None):
+    if isinstance(value, Expr):
+        return value.migration.format(app_label=app_label) if migration else value.model
+    if isinstance(value, list):
+        return '[' + ', '.join(_value_source(item, migration, app_label) for item in value) + ']'
+    if isinstance(value, tuple):
+        # Meta options such as indexes are (class, kwargs) pairs
+        cls, kwargs = value
+        return f"{cls}({_kwargs_source(kwargs, migration, app_label)})"
+    return repr(value)
+
+def _kwargs_source(kwargs, migration=False, app_label=None):
+    items = kwargs.items()
+    if migration:
+        # The migration writer orders keyword arguments by name
+        items = sorted(items)
+    elif 'to' in kwargs:
+        # The related model is positional in models.py
+        items = [('', kwargs['to'])] + [(key, value) for key, value in items if key != 'to']
+    parts = []
+    for key, value in items:
+        source = _value_source(value, migration, app_label)
+        parts.append(f"{key}={source}" if key else source)
+    return ', '.join(parts)
+
+def _field_source(field_class, kwargs):
+    """models.py spelling: one line when short, one argument per line otherwise"""
+    line = f"{field_class}({_kwargs_source(kwargs)})"
+    if len(line) <= 70:
+        return line
+    return f"{field_class}(\n        " + _kwargs_source(kwargs).replace(', ', ',\n        ', len(kwargs) - 1) + "\n    )"
+
+def render_models(models_spec, preferences):
+    """Render models.py from a model spec"""
+    parts = [_manager_source(preferences)]
+    for model in models_spec:
+        if model.get('prelude'):
+            parts.append(model['prelude'] + '\n')
+        lines = [f"class {model['name']}({', '.join(model['bases'])}):"]
+        for name, field_class, kwargs in model['fields']:
+            lines.append(f"    {name} = {_field_source(field_class, kwargs)}")
+        meta = model.get('options', {})
+        if meta:
+            lines.append("    ")
+            lines.append("    class Meta:")
+            for key, value in meta.items():
+                source = _value_source(value)
+                if isinstance(value, list) and len(source) > 70:
+                    source = "[\n" + ''.join(f"            {_value_source(item)},\n" for item in value) + "        ]"
+                lines.append(f"        {key} = {source}")
+        if model.get('body'):
+            lines.append("    ")
+            lines.append(model['body'])
+        parts.append('\n'.join(lines) + '\n')
+    return '\n\n'.join(parts)
+
+def render_initial_migration(models_spec, app_label):
+    """
+    Render the 0001_initial migration matching a model spec
+
+    Operations are laid out the way makemigrations lays them out: the
+    implicit id first, inherited fields next, then the model's own fields,
+    with relations appended in name order.
+    """
+    imports = {'from django.db import migrations, models'}
+    dependencies = []
+    operations = []
+    
+    for model in models_spec:
+        fields = []
+        if not any(kwargs.get('primary_key') for _, _, kwargs in model['fields']):
+            fields.append(('id', 'models.BigAutoField', {
+                'auto_created': True, 'primary_key': True, 'serialize': False, 'verbose_name': 'ID'
+            }))
+        own = model.get('inherited', []) + model['fields']
+        fields += [field for field in own if field[1] not in RELATED_FIELDS]
+        fields += sorted((field for field in own if field[1] in RELATED_FIELDS), key=lambda field: field[0])
+        
+        field_lines = []
+        for name, field_class, kwargs in fields:
+            if kwargs.get('primary_key'):
+                # Django marks explicit primary keys as not serialized
+                kwargs = dict(kwargs, serialize=False)
+            for value in kwargs.values():
+                if isinstance(value, Expr):
+                    imports.update(value.imports)
+            if field_class == 'models.ManyToManyField' and kwargs['to'].startswith('auth.'):
+                if AUTH_DEPENDENCY not in dependencies:
+                    dependencies.append(AUTH_DEPENDENCY)
+            field_lines.append(
+                f"                ({name!r}, {field_class}({_kwargs_source(kwargs, True, app_label)})),"
+            )
+        
+        operation = [
+            "        migrations.CreateModel(",
+            f"            name={model['name']!r},",
+            "            fields=[",
+            *field_lines,
+            "            ],",
+        ]
+        options = model.get('options', {})
+        if options:
+            operation.append("            options={")
+            for key, value in sorted(options.items()):
+                operation.append(f"                {key!r}: {_value_source(value, True, app_label)},")
+            operation.append("            },")
+        operation.append("        ),")
+        operations.append('\n'.join(operation))
+    
+    # Same ordering as the migration writer: by module, "import x" and "from x" mixed
+    import_lines = sorted(imports, key=lambda line: line.split()[1])
+    dependency_lines = ''.join(f"        {dependency!r},\n" for dependency in dependencies)
+    return f"""# Generated by boiler.py from the user model spec
+
+{chr(10).join(import_lines)}
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+{dependency_lines}    ]
+
+    operations = [
+{chr(10).join(operations)}
+    ]
 """
-        model_content += '\n'.join(profile_fields)
-        model_content += """
-    
-    def __str__(self):
-        return f"{self.user.email}'s Profile"
+
+MIGRATION_TEST = """from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class InitialMigrationTests(TestCase):
+    \"\"\"The generated 0001_initial migration must match models.py\"\"\"
+
+    def test_no_missing_migrations(self):
+        out = StringIO()
+        try:
+            call_command('makemigrations', '{app_label}', check=True, dry_run=True, stdout=out)
+        except SystemExit:
+            self.fail(f"models.py and the migrations disagree:\\n{{out.getvalue()}}")
 """
-    
-    return model_content
 
-def create_models_file(app_name, preferences):
+USER_SIGNAL_TEST = """from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from {app_label}.models import UserProfile
+
+User = get_user_model()
+
+
+class UserSignalTests(TestCase):
+    \"\"\"Creating and updating users must work with or without the role system\"\"\"
+
+    def test_profile_created_with_user(self):
+        user = User.objects.create_user(email='signals@example.com', password='Signals-password-123')
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+    def test_update_user(self):
+        user = User.objects.create_user(email='signals@example.com', password='Signals-password-123')
+        user.first_name = 'Updated'
+        user.save()
+        self.assertEqual(UserProfile.objects.filter(user=user).count(), 1)
+"""
+
+def generate_user_model(preferences):
+    """
+    Generate customized user model based on preferences
+    """
+    return render_models(build_model_spec(preferences), preferences)
+
+def _write(path, content, manifest):
+    if manifest is not None:
+        return manifest.write(path, content)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True
+
+def create_models_file(app_name, preferences, manifest=None, initial_migration=False):
     """
     Create models.py file with customized user model
+
+    With ``initial_migration``, the matching migrations/0001_initial.py is
+    rendered from the same spec (so makemigrations doesn't have to run),
+    together with a test that checks it against the autodetector. A test
+    that user signals work for the chosen fields is always written (the
+    auth query and cold start tests ship with the app files). With a
+    generation manifest, files are only written when their content changed.
     """
-    models_content = generate_user_model(preferences)
+    models_spec = build_model_spec(preferences)
+    models_content = render_models(models_spec, preferences)
     
     # Write to models.py in the app directory
     models_path = Path(app_name) / 'models.py'
+    app_label = Path(app_name).name
     
     try:
-        with open(models_path, 'w', encoding='utf-8') as f:
-            f.write(models_content)
+        written = _write(models_path, models_content, manifest)
+        if initial_migration:
+            _write(Path(app_name) / 'migrations' / '__init__.py', '', manifest)
+            _write(Path(app_name) / 'migrations' / '0001_initial.py', render_initial_migration(models_spec, app_label), manifest)
+            _write(Path(app_name) / 'test_migrations.py', MIGRATION_TEST.format(app_label=app_label), manifest)
+            print(f"✅ Generated {app_name}/migrations/0001_initial.py from the model spec")
+        _write(Path(app_name) / 'test_signals.py', USER_SIGNAL_TEST.format(app_label=app_label), manifest)
         
-        print(f"\n✅ Created customized models.py in {app_name}/ directory")
+        if written:
+            print(f"\n✅ Created customized models.py in {app_name}/ directory")
+        else:
+            print(f"\n✅ {app_name}/models.py is already up to date")
         
         # Show summary of customizations
         print("\n" + "="*50)
@@ -291,8 +635,7 @@ def create_models_file(app_name, preferences):
         
         print(f"✅ Preferences field: {'Included' if preferences.get('include_preferences', True) else 'Excluded'}")
         
-        profile_fields = ['job_title', 'social_links', 'communication_preferences', 'security_settings']
-        included_fields = [field for field in profile_fields if preferences.get(field, False)]
+        included_fields = [field for field in PROFILE_FIELDS if preferences.get(field, False)]
         
         if included_fields:
             print(f"✅ UserProfile fields: {', '.join(included_fields)}")
@@ -305,17 +648,20 @@ def create_models_file(app_name, preferences):
         print(f"❌ Error creating models.py: {e}")
         return False
 
-def customize_user_model(app_name):
+def customize_user_model(app_name, preferences=None, manifest=None, initial_migration=False):
     """
     Main function to customize user model
+    
+    Prompts for the preferences unless they are passed in (e.g. from a spec file).
     """
     print("\n🎨 Starting User Model Customization...")
     
     # Get user preferences
-    preferences = get_user_preferences()
+    if preferences is None:
+        preferences = get_user_preferences()
     
     # Create the customized models file
-    success = create_models_file(app_name, preferences)
+    success = create_models_file(app_name, preferences, manifest, initial_migration)
     
     if success:
         print(f"\n🎉 User model customization completed successfully!")